@@ -1,8 +1,21 @@
+import math
+import time
 import streamlit as st
 import numpy as np
+import pandas as pd
+import profiling
 from finance_math import *
 import plotting as plots
 from helpers import *
+from simulation import Params, in_real_terms, simulate
+from breakeven import solve_break_even
+from sensitivity import RATE_STEP, RELATIVE_STEP, sensitivity
+from heatmap import AXES, covers, interpolate, load_grid
+from scenarios import evaluate_scenarios
+from export import result_table, to_bytes
+
+RERUN_START = time.perf_counter()
+profiling.enable(profiling.ENABLED or st.experimental_get_query_params().get('profile', ['0'])[0] not in ('', '0'))
 
 
 ################## TITLE ######################
@@ -15,34 +28,142 @@ st.divider()
 
 
 ################## SIDEBAR ######################
+# The inputs are mirrored to the query string in the sidebar units, so a link restores them.
+# The link is read once per session to keep the widget defaults stable.
+SHARED_INPUTS = st.session_state.get('shared_inputs')
+if SHARED_INPUTS is None:
+    SHARED_INPUTS = st.session_state['shared_inputs'] = {name: values[-1] for name, values
+                                                         in st.experimental_get_query_params().items()}
+INPUTS = {}
+
+def number_input(label, name, min_value, max_value, value, step, key):
+    '''Sidebar number input starting from the value of the shared link, if it has a valid one'''
+    try:
+        shared = float(SHARED_INPUTS[name])
+        if math.isfinite(shared):
+            value = min(max(type(value)(shared), min_value), max_value)
+    except (KeyError, ValueError, OverflowError):
+        pass
+    INPUTS[name] = st.sidebar.number_input(label, min_value, max_value, value, step, key=key)
+    return INPUTS[name]
+
+def selectbox(label, name, options, key):
+    '''Sidebar choice of the options' values by their labels, starting from the shared link'''
+    values = list(options.values())
+    index = values.index(SHARED_INPUTS[name]) if SHARED_INPUTS.get(name) in values else 0
+    INPUTS[name] = st.sidebar.selectbox(label, values, index, format_func={v: k for k, v in options.items()}.get, key=key)
+    return INPUTS[name]
+
+def parse_pairs(text):
+    '''(year, value) rows of 'year:value,year:value', the invalid and non-finite pairs are skipped'''
+    rows = []
+    for pair in text.split(','):
+        try:
+            year, value = map(float, pair.split(':'))
+        except ValueError:
+            continue
+        if math.isfinite(year) and math.isfinite(value):
+            rows.append((year, value))
+    return rows
+
+def yearly_editor(label, name, caption, value_column):
+    '''Sidebar table of (year, value) rows restored from the shared link
+
+    Returns the rows by year inside the loan term, which are also shared in the link.
+    '''
+    with st.sidebar.expander(label):
+        st.caption(caption)
+        shared = pd.DataFrame(parse_pairs(SHARED_INPUTS.get(name, '')), columns=['After year', value_column])
+        rows = st.experimental_data_editor(shared.astype({'After year': int, value_column: float}),
+                                           num_rows='dynamic', use_container_width=True, key=name)
+    rows = {year: value for year, value in rows.dropna().itertuples(index=False) if 0 < year < LOAN_TERM}
+    INPUTS[name] = ','.join(f'{year}:{value}' for year, value in sorted(rows.items()))
+    return rows
+
 st.sidebar.header('Please, provide your own parameters for:')
 st.sidebar.subheader('Apartment and Mortgage')
-APARTMENT_PRICE = st.sidebar.number_input('Apartment purchasing price [$]', 1000, 10_000_000, 175_000, 10_000, key='1')
-DOWN_PAYMENT = st.sidebar.number_input('Down Payment [$]', 1000, 10_000_000, 17_500, 1_000, key='2')
+APARTMENT_PRICE = number_input('Apartment purchasing price [$]', 'apartment_price', 1000, 10_000_000, 175_000, 10_000, key='1')
+DOWN_PAYMENT = number_input('Down Payment [$]', 'down_payment', 1000, 10_000_000, 17_500, 1_000, key='2')
 LOAN_AMOUNT = APARTMENT_PRICE - DOWN_PAYMENT
-LOAN_TERM = st.sidebar.number_input('Mortgage Term [Years]', 1, 50, 25, 1, key='3')
-INTEREST_RATE = st.sidebar.number_input('Interest rate [%]', 0.01, 50.00, 4.50, 0.5, key='4') / 100 # To actual percentages
-APARTMENT_CONDO = st.sidebar.number_input('Condominium Fee / Maintenance [$]', 0, 10_000, 220, 100, key='8')
-APARTMENT_RETURN = st.sidebar.number_input('Apartment price Return [%]', -50.00, 50.00, 0.50, 0.05, key='9') / 100
-APARTMENT_TAX = st.sidebar.number_input('Apartment Gain Tax[%]', 0.00, 100.00, 0.00, 1.00, key='11') / 100
+LOAN_TERM = number_input('Mortgage Term [Years]', 'loan_term', 1, 50, 25, 1, key='3')
+INTEREST_RATE = number_input('Interest rate [%]', 'interest_rate', 0.01, 50.00, 4.50, 0.5, key='4') / 100 # To actual percentages
+RESET_ROWS = yearly_editor('Variable rate (Euribor resets)', 'rate_resets',
+                           'The remaining loan is re-amortized with the new rate after the given year.', 'Rate [%]')
+RATE_RESETS = tuple(sorted((int(year * 12), rate / 100) for year, rate in RESET_ROWS.items()))
+PREPAYMENT_ROWS = yearly_editor('Prepayments', 'prepayments',
+                                'Paid from your investments at the end of the given year, '
+                                'the remaining loan is re-amortized with lower instalments.', 'Amount [$]')
+PREPAYMENTS = tuple(sorted((int(year * 12), amount) for year, amount in PREPAYMENT_ROWS.items() if amount > 0))
+APARTMENT_CONDO = number_input('Condominium Fee / Maintenance [$]', 'apartment_condo', 0, 10_000, 220, 100, key='8')
+APARTMENT_RETURN = number_input('Apartment price Return [%]', 'apartment_return', -50.00, 50.00, 0.50, 0.05, key='9') / 100
+APARTMENT_TAX = number_input('Apartment Gain Tax[%]', 'apartment_tax', 0.00, 100.00, 0.00, 1.00, key='11') / 100
+CONDO_GROWTH = number_input('Condominium Fee Increase [%/year]', 'condo_growth', 0.00, 50.00, 0.00, 0.50, key='14') / 100
 
 st.sidebar.subheader('Renting')
-RENT = st.sidebar.number_input('Rent [$]', 100, 10_000, 850, 100, key='10')
+RENT = number_input('Rent [$]', 'rent', 100, 10_000, 850, 100, key='10')
+RENT_GROWTH = number_input('Rent Increase [%/year]', 'rent_growth', 0.00, 50.00, 0.00, 0.50, key='13') / 100
 
 st.sidebar.subheader('Investing and Horizont')
-TIME_HORIZONT = st.sidebar.number_input('Time Horizont [Years]', 1, 100, 5, 1, key='6')
-STOCK_RETURN = st.sidebar.number_input('Investments Return [%]', 0.01, 50.00, 7.00, 1.00, key='7') / 100
-STOCK_TAX = st.sidebar.number_input('Capital Asset Gain Tax[%]', 0.00, 100.00, 30.00, 1.00, key='12') / 100
+TIME_HORIZONT = number_input('Time Horizont [Years]', 'time_horizont', 1, 100, 5, 1, key='6')
+STOCK_RETURN = number_input('Investments Return [%]', 'stock_return', 0.01, 50.00, 7.00, 1.00, key='7') / 100
+STOCK_TAX = number_input('Capital Asset Gain Tax[%]', 'stock_tax', 0.00, 100.00, 30.00, 1.00, key='12') / 100
+REALIZE_YEARS = number_input('Realize Capital Gains Every [Years, 0 at sale]', 'realize_years', 0, 100, 0, 1, key='16')
+TAX_ALLOWANCE = number_input('Yearly Tax-free Capital Gains [$]', 'tax_allowance', 0, 1_000_000, 0, 1_000, key='17')
+COST_METHOD = selectbox('Cost of Sold Shares', 'cost_method',
+                        {'First in, first out': 'fifo', 'Average cost': 'average'}, key='18')
+SAVINGS = number_input('Extra Monthly Savings [$]', 'savings', 0, 100_000, 0, 100, key='15')
+INFLATION = number_input('Inflation [%/year]', 'inflation', 0.00, 50.00, 2.00, 0.50, key='19') / 100
+REAL_TERMS = INPUTS['real_terms'] = st.sidebar.checkbox("Show in Today's Dollars (real terms)",
+                                                        SHARED_INPUTS.get('real_terms') == 'True', key='20')
+
+current_query = {name: values[-1] for name, values in st.experimental_get_query_params().items()}
+query = {name: str(value) for name, value in INPUTS.items() if value != ''}
+if 'profile' in current_query:
+    query['profile'] = current_query['profile']
+if query != current_query:
+    st.experimental_set_query_params(**query)
 
 
 ################# PAGES #################
-df = generate_amortization_schedule(P=LOAN_AMOUNT, T=LOAN_TERM, r=INTEREST_RATE)
-monthly_return = np.power(APARTMENT_RETURN + 1, 1/12)
-df['Apartment'] = np.cumprod(np.full(len(df), monthly_return)) * APARTMENT_PRICE
-df['Condominium'] = APARTMENT_CONDO
+def section(title, expanded=False):
+    '''Subheader of a section with a toggle to show it
+
+    Streamlit runs the contents of tabs and expanders even when they are closed,
+    so the sections are plain if blocks and a hidden section computes,
+    formats and serializes nothing on a rerun.
+    '''
+    st.subheader(title)
+    return st.checkbox('Show', value=expanded, key=f'section {title}')
+
 
-st.subheader('Mortgage and Apartment')
-text = f'''Let's first consider the typical example of purchasing a house.\\
+params = Params(apartment_price=APARTMENT_PRICE,
+                down_payment=DOWN_PAYMENT,
+                loan_term=LOAN_TERM,
+                interest_rate=INTEREST_RATE,
+                apartment_condo=APARTMENT_CONDO,
+                apartment_return=APARTMENT_RETURN,
+                apartment_tax=APARTMENT_TAX,
+                rent=RENT,
+                time_horizont=TIME_HORIZONT,
+                stock_return=STOCK_RETURN,
+                stock_tax=STOCK_TAX,
+                rent_growth=RENT_GROWTH,
+                condo_growth=CONDO_GROWTH,
+                savings=SAVINGS,
+                rate_resets=RATE_RESETS,
+                prepayments=PREPAYMENTS,
+                realize_years=REALIZE_YEARS,
+                tax_allowance=TAX_ALLOWANCE,
+                cost_method=COST_METHOD)
+# Only the display is deflated, so the toggle and the inflation reuse the cached nominal result
+nominal = simulate(params)
+result = nominal
+if REAL_TERMS:
+    result = in_real_terms(nominal, deflator(INFLATION, (LOAN_TERM + TIME_HORIZONT + 1) * 12))
+
+if section('Mortgage and Apartment'):
+    df = result.mortgage
+    text = f'''Let's first consider the typical example of purchasing a house.\\
 Suppose you plan to buy a house :house: for :red[**{money_to_string(APARTMENT_PRICE)}**].\\
 You have already saved :green[**{money_to_string(DOWN_PAYMENT)}**] (which is about {DOWN_PAYMENT/APARTMENT_PRICE*100:.0f}% of the purchase price)\\
 This down payment means you need to apply for a loan of :red[**{money_to_string(APARTMENT_PRICE - DOWN_PAYMENT)}**] from the bank :bank:  
@@ -51,34 +172,42 @@ For you, this is a liability, which is a negative value, as it is the amount you
 Assuming that your yearly interest rate remains constant at :red[**{INTEREST_RATE*100:.1f}%**]  
 and you will pay off the loan over :green[**{LOAN_TERM} years**] using *Amortized* loan payments,\\
 the outstanding loan balance will change over time as demonstrated in the image below:'''
-st.markdown(text)
-plots.plot_balance_projection(df)
+    st.markdown(text)
+    plots.plot_balance_projection(df)
+    if RATE_RESETS:
+        st.caption('With the variable rate, the rate resets to '
+                   + ', '.join(f'{rate*100:.1f}% after year {month/12:g}' for month, rate in RATE_RESETS)
+                   + ', and the monthly payment is recomputed for the remaining term at every reset.')
 
 
-text = f'''Fortunately, you are not throwing your money out of the window :money_with_wings: when you purchase a house.\\
+    text = f'''Fortunately, you are not throwing your money out of the window :money_with_wings: when you purchase a house.\\
 Instead, :green[**you gain a valuable asset**] that contributes positively to your financial portfolio.\\
 This asset, which you will own despite holding debt, is recorded on the :green[**Asset side**] of your **Balance Sheet**.\\
 When you purchase a house, its initial value is the price you paid for it.\\
 Over time, as property values typically appreciate, the value of your house is likely to increase.\\
 Assuming a modest annual appreciation rate of :green[**increase {APARTMENT_RETURN*100:.1f}% yearly**],\\
 your house's value will grow, thereby increasing your total assets as follows:'''
-st.markdown(text)
-plots.plot_apartment_return(df)
+    st.markdown(text)
+    plots.plot_apartment_return(df)
 
 
-text = f'''Now that we have examined both the :red[*Liabilites*] and the :green[*Assets*] associated with owning a house,\\
+    text = f'''Now that we have examined both the :red[*Liabilites*] and the :green[*Assets*] associated with owning a house,\\
     we can plot these together on the correct sides of the **Balance Sheet**.\\
     This will help us visualize your :orange[**Net Assets**] **(**:green[*Assets*]**-**:red[*Liabilites*]**)** and how they accumulate over time :chart_with_upwards_trend:
     '''
-st.markdown(text)
-plots.plot_apartment_net_assets(df)
+    st.markdown(text)
+    plots.plot_apartment_net_assets(df)
 
 
-text = f'''Owning a house involves various **Cash Flows** that contribute to both liabilities and assets.\\
+    if CONDO_GROWTH:
+        condo_note = f'Note, the Condominium fee increases by {CONDO_GROWTH*100:.1f}% every year, starting from the fee above.'
+    else:
+        condo_note = "Note, the Condominium fee is likley to increase with a relation to the house price, but it's not considered in this simplifed example."
+    text = f'''Owning a house involves various **Cash Flows** that contribute to both liabilities and assets.\\
     Understanding these cash flows is crucial to grasping how your :orange[**Net Assets**] increase over time.\\
     Here, we will break down the different components of the cash flow involved in owning a house.\\
     \\
-    **- {money_to_string(float(APARTMENT_CONDO))} Condominium Fee**: *A fixed monthly fee charged as long as you own the house.*\\
+    **- {money_to_string(float(APARTMENT_CONDO))} Condominium Fee**: *A {'fixed ' if not CONDO_GROWTH else ''}monthly fee charged as long as you own the house.*\\
     :green[**- Principa Payment {money_to_string(df['Principal'][0])}**]: *The sum dedicated to payoff the loan*\\
     :red[**- Loan Interest {money_to_string(df['Interest'][0])}**]: *The cumulated interst since the last payment*\\
     :red[**- Total Monthly Cost {money_to_string(APARTMENT_CONDO + df['Interest'][0] + df['Principal'][0])}**]: *The sum of the Condominium Fee, Principal Payment, and Loan Interest.*\\
@@ -88,20 +217,23 @@ text = f'''Owning a house involves various **Cash Flows** that contribute to bot
     The Principal Payment gradually increases, while the Loan Interest decreases.\\
     This change happens because as you pay off the loan, the interest is calculated on a lower remaining balance.\\
     \\
-    Note, the Condominium fee is likley to increase with a relation to the house price, but it's not considered in this simplifed example.
+    {condo_note}
 '''
-st.markdown(text)
-plots.plot_payment(df)
+    st.markdown(text)
+    plots.plot_payment(df)
 
 
 
 
-st.subheader('Renting and Investing')
-fcf_rent = APARTMENT_CONDO + df['Interest'][0] + df['Principal'][0] - RENT
-df_invest = generate_investment_schedule(DOWN_PAYMENT, fcf_rent, STOCK_RETURN, LOAN_TERM)
-df_invest['NetAssets'] = df_invest['Balance']
-text = f'''Imagine you have the option to rent the same house you are considering to purchase for :red[**{money_to_string(RENT)}**] per month (in the reality, the rent cost is likley to increase, but it's not considered in this simplifed example).
-This rental amount provides you with :green[**{money_to_string(fcf_rent)} more in Free Cash Flow**] compared to owning the same house.\\
+if section('Renting and Investing'):
+    fcf_rent = result.fcf_rent
+    df_invest = result.renting
+    if RENT_GROWTH:
+        rent_note = f'increasing by {RENT_GROWTH*100:.1f}% every year'
+    else:
+        rent_note = "(in the reality, the rent cost is likley to increase, but it's not considered in this simplifed example)"
+    text = f'''Imagine you have the option to rent the same house you are considering to purchase for :red[**{money_to_string(RENT)}**] per month {rent_note}.
+This rental amount provides you with :green[**{money_to_string(fcf_rent)} more in Free Cash Flow**] compared to owning the same house{' in the first year' if RENT_GROWTH or CONDO_GROWTH else ''}.\\
 While paying rent is typically viewed as an expense that doesn't build equity :money_with_wings:,   
 strategic financial planning can turn this into a profitable scenario.  
 Instead of simply pocketing the additional money under your bed each month :bed:,   
@@ -109,71 +241,60 @@ you decide to invest this surplus into the stock market :chart_with_upwards_tren
 Additionally, you start with an initial investment of :green[**{money_to_string(DOWN_PAYMENT)}**], the amount you would have used for a down payment.\\
 \\
 By renting and investing the excess cash flow,\\
-you could potentially generate a net fortune of :green[**{money_to_string(df_invest['Balance'].iloc[-1])}**] before taxes.\\
-In comparison, owning the house might result in a net worth of :green[**{money_to_string(df['Apartment'].iloc[-1])}**] due to property appreciation and equity buildup.\\
+you could potentially generate a net fortune of :green[**{money_to_string(df_invest['Balance'][-1])}**] before taxes.\\
+In comparison, owning the house might result in a net worth of :green[**{money_to_string(result.mortgage['Apartment'][-1])}**] due to property appreciation and equity buildup.\\
 \\
 *This example does not consider that the house owner can also invest excess money after fully paying off the loan. 
 Additionally, there are taxation procedures for realizing capital gains,
 which can affect the final outcomes.
 These factors are considered in the more comprehensive analysis.*
 '''
-st.markdown(text)
-plots.plot_renting_net_assets(df_invest)
-
-
-
-st.subheader('Longer Timehorizont with Taxes')
-df = pd.DataFrame()
-df_loan = generate_amortization_schedule(P=LOAN_AMOUNT, T=LOAN_TERM, r=INTEREST_RATE)
-fcf = df_loan['Interest'][0]+df_loan['Principal'][0]
-df_invest = generate_investment_schedule(0, fcf, STOCK_RETURN, TIME_HORIZONT)
-df['Month'] = np.arange(0, len(df_loan)+len(df_invest))
-df['Year'] = np.ceil(df['Month']/12).astype(int)
-df['Balance'] = np.pad(df_loan['Balance'], (0, len(df_invest )), 'constant', constant_values=(0, 0))
-df['Contributions'] = np.pad(df_invest['Contributions'], (len(df_loan), 0), 'constant', constant_values=(0, 0))
-df['Interest'] = np.pad(df_invest['Interest'], (len(df_loan), 0), 'constant', constant_values=(0, 0))
-df['Apartment'] = APARTMENT_PRICE
-monthly_return = np.power(APARTMENT_RETURN + 1, 1/12)
-df['ApartmentGain'] = np.cumprod(np.full(len(df), monthly_return)) * APARTMENT_PRICE - APARTMENT_PRICE
-df['NetAssets'] = df['Apartment'] + df['ApartmentGain'] + df['Contributions'] + df['Interest']-df['Balance']
-df.iloc[-1] = [(LOAN_TERM+TIME_HORIZONT)*12+12, 
-               (LOAN_TERM+TIME_HORIZONT)+1, 
-               0, # Balance
-               0, # Contributions
-               0, # Interest
-               0, # Apartment
-               0, # ApartmentGain
-               df['NetAssets'].iloc[-1] - df['ApartmentGain'].iloc[-1]*APARTMENT_TAX - df['Interest'].iloc[-1]*STOCK_TAX]
-
-text = f'''After fully paying off the mortgage,\\
+    st.markdown(text)
+    plots.plot_renting_net_assets(df_invest)
+
+
+
+if section('Longer Timehorizont with Taxes'):
+    fcf_rent = result.fcf_rent
+    fcf = result.fcf
+    df = result.owning_long
+    ledger_notes = []
+    if SAVINGS:
+        ledger_notes.append(f'Both households also invest the extra savings of :green[**{money_to_string(SAVINGS)}**] every month, the owner already during the loan.')
+    if PREPAYMENTS:
+        ledger_notes.append(f"The prepayments of :red[**{money_to_string(sum(amount for _, amount in PREPAYMENTS))}**] are paid from the owner's investments, and the lower instalments after them are invested.")
+        # A withdrawal beyond the balance leaves a negative balance that compounds at the stock return
+        shortfall = -np.min(df['Contributions'] + df['Interest'])
+        if shortfall > 0:
+            ledger_notes.append(f'The investments do not cover them, so a shortfall of up to :red[**{money_to_string(shortfall)}**] is borrowed at the stock return of :red[**{STOCK_RETURN*100:.1f}%**].')
+    if REALIZE_YEARS:
+        ledger_notes.append(f'The capital gains are realized and taxed every {REALIZE_YEARS} years already before the sale.')
+    if TAX_ALLOWANCE:
+        ledger_notes.append(f'The first :green[**{money_to_string(TAX_ALLOWANCE)}**] of the capital gains realized every year are tax-free, and the losses are carried forward.')
+    ledger_text = ''.join(note + '\\\n' for note in ledger_notes)
+
+    text = f'''After fully paying off the mortgage,\\
 a house owner can also benefit from investing the :green[**Surplus Cash Flow of {money_to_string(fcf)}**].\\
 Let's consider an extended period of {LOAN_TERM+TIME_HORIZONT} years after the mortgage is paid off,\\
 during which the house owner invests this additional cash flow to the stock market :chart_with_upwards_trend:\\
-At the end of this period, **all assets will be sold**,\\
+{ledger_text}At the end of this period, **all assets will be sold**,\\
 and **taxes on** :green[*capital gains*] :red[**{STOCK_TAX*100:.1f}%**] and on :green[*apartment gains*] :red[**{APARTMENT_TAX*100:.1f}%**] **will be realized**.\\
-This will decreased the generated :orange[**Net Assets**] from :green[**{money_to_string(df['NetAssets'].iloc[-2])}**] to :green[**{money_to_string(df['NetAssets'].iloc[-1])}**]
+This will decreased the generated :orange[**Net Assets**] from :green[**{money_to_string(df['NetAssets'][-2])}**] to :green[**{money_to_string(df['NetAssets'][-1])}**]
 '''
-st.markdown(text)
-plots.plot_apartment_net_assets_with_investing(df)
+    st.markdown(text)
+    plots.plot_apartment_net_assets_with_investing(df)
 
 
 
-df_invest = generate_investment_schedule(DOWN_PAYMENT, fcf_rent, STOCK_RETURN, LOAN_TERM+TIME_HORIZONT)
-df_invest['NetAssets'] = df_invest['Contributions'] + df_invest['Interest']
-df_invest.iloc[-1] = [(LOAN_TERM+TIME_HORIZONT)+1, 
-               (LOAN_TERM+TIME_HORIZONT)*12+12, 
-               0, # Contributions
-               0, # Interest
-               0, # Balance
-               df_invest['NetAssets'].iloc[-1] - df_invest['Interest'].iloc[-1]*STOCK_TAX]
+    df_invest = result.renting_long
 
-text = f'''By renting and investing the excess cash of :green[**{money_to_string(fcf_rent)}**] flow over a **{(LOAN_TERM+TIME_HORIZONT)}-year period**,\\
+    text = f'''By renting and investing the excess cash of :green[**{money_to_string(fcf_rent)}**] flow over a **{(LOAN_TERM+TIME_HORIZONT)}-year period**,\\
 you could potentially accumulate significant wealth :moneybag:\\
 After accounting for :red[**capital gains tax**] as in the previous part,\\
-the generated :orange[**Net Assets**] will decreased  from :green[**{money_to_string(df_invest['NetAssets'].iloc[-2])}**] to :green[**{money_to_string(df_invest['NetAssets'].iloc[-1])}**]
+the generated :orange[**Net Assets**] will decreased  from :green[**{money_to_string(df_invest['NetAssets'][-2])}**] to :green[**{money_to_string(df_invest['NetAssets'][-1])}**]
 but provides still a clear picture of the financial benefits of this strategy.'''
-st.markdown(text)
-plots.plot_renting_net_assets(df_invest)
+    st.markdown(text)
+    plots.plot_renting_net_assets(df_invest)
 
 
 
@@ -184,16 +305,97 @@ def str_help(own_net, rent_net):
     else:
         return f'''**Renting the apartment :house: would be more profitable**\\
               by generating :green[**{money_to_string(rent_net)}**] after the taxes, compared to :red[**{money_to_string(own_net)}**] by owning it.'''
-    
-st.subheader('Comparison')
-text = f'''Both scenarios have their benefits.\\
+
+# The break-even rent, the tornado chart and the heatmap evaluate many scenarios at once with this model
+SIMPLIFIED_MODEL = 'the simplified model with a fixed rate and the taxes at the final sale'
+IGNORED_INPUTS = {'rate_resets': 'rate resets', 'prepayments': 'prepayments', 'realize_years': 'realizations',
+                  'tax_allowance': 'tax-free gains', 'cost_method': 'cost method'}
+
+def str_simplified(params, subject='It'):
+    '''Names the simplified model and the inputs of the page that it leaves out'''
+    ignored = [IGNORED_INPUTS[name] for name in params.scenario_ignored()]
+    if not ignored:
+        return f'{subject} uses {SIMPLIFIED_MODEL}.'
+    ignored = ' and '.join(filter(None, (', '.join(ignored[:-1]), ignored[-1])))
+    return f'{subject} uses {SIMPLIFIED_MODEL}, without your {ignored}, so it can differ from the figures above.'
+
+def str_break_even(params):
+    rent = solve_break_even('rent', (0, 100_000), params.scenario_params())[0]
+    if np.isnan(rent):
+        return ''
+    return f'''\\
+    \\
+    Both options would end up equal with a rent of :orange[**{money_to_string(rent)}**] per month,\\
+    a higher rent favours owning and a lower one renting. *{str_simplified(params, 'This')}*'''
+
+if section('Comparison', expanded=True):
+    df, df_invest = result.owning_long, result.renting_long
+    real_note = ''
+    if REAL_TERMS:
+        real_note = f'''\\
+    \\
+    *All the amounts are in today's dollars, deflated by {INFLATION*100:.1f}% inflation a year.*'''
+    text = f'''Both scenarios have their benefits.\\
     Owning a house offers stability and potential property appreciation,\\
     while renting and investing provide higher flexibility and potential for greater financial returns,\\
     particularly when excess cash flow is invested wisely.\\
     \\
     **Individual preferences, financial goals, and market conditions should guide the decision between these two strategies**, although, using your inputs:\\
     \\
-    {str_help(df['NetAssets'].iloc[-1], df_invest['NetAssets'].iloc[-1])}'''
-st.markdown(text)
-plots.plot_summary(df, df_invest)
+    {str_help(df['NetAssets'][-1], df_invest['NetAssets'][-1])}{str_break_even(params)}{real_note}'''
+    st.markdown(text)
+    column_summary, column_tornado = st.columns(2)
+    with column_summary:
+        plots.plot_summary(df, df_invest)
+    with column_tornado:
+        plots.plot_tornado(sensitivity(params.scenario_params()))
+    st.caption(f'''The tornado chart moves one input at a time by {RELATIVE_STEP*100:.0f}%, or the rates by {RATE_STEP*100:.0f} percentage point,
+    and shows how much more owning generates than renting in nominal dollars, the longest bars matter the most.
+    {str_simplified(params)}''')
+
+
+
+if section('Break-even Heatmap'):
+    axis_names = list(AXES)
+    column_x, column_y = st.columns(2)
+    x_name = column_x.selectbox('Horizontal axis', axis_names, index=axis_names.index('rent'),
+                                format_func=lambda name: AXES[name][1], key='heatmap_x')
+    y_name = column_y.selectbox('Vertical axis', axis_names, index=axis_names.index('apartment_return'),
+                                format_func=lambda name: AXES[name][1], key='heatmap_y')
+    if x_name == y_name:
+        st.warning('Please, choose two different parameters for the axes.')
+    else:
+        grid = load_grid(x_name, y_name, params.scenario_params())
+        inputs = (getattr(params, x_name), getattr(params, y_name))
+        on_grid = bool(covers(grid, *inputs))
+        if on_grid:
+            difference = float(interpolate(grid, *inputs))
+        else:
+            # The grid would clip the inputs to its edge, so they are evaluated exactly
+            difference = float(evaluate_scenarios(params.scenario_params(), full=False).difference[0])
+        marker_note = ' :heavy_multiplication_x:' if on_grid else ' (outside the heatmap, so not marked on it)'
+        winner = 'owning' if difference > 0 else 'renting'
+        text = f'''The heatmap shows how much more :orange[**Net Assets**] owning generates compared to renting after the taxes,\\
+    when the two chosen parameters vary and the other inputs of the simplified model are kept.\\
+    {str_simplified(params)}\\
+    :green[*Green*] areas favour owning and :red[*red*] areas renting,
+    and the border between them is the break-even line.\\
+    With your inputs{marker_note} {winner} is ahead by about :green[**{money_to_string(abs(difference))}**].'''
+        st.markdown(text)
+        plots.plot_heatmap(grid, marker=inputs if on_grid else None)
+
+
+if section('Download the Schedules'):
+    st.markdown('''All the schedules behind the charts in one table, one row per month and schedule,
+    with your inputs stored in the file metadata.''')
+    table = result_table(nominal, params)
+    column_parquet, column_arrow = st.columns(2)
+    column_parquet.download_button('Parquet', to_bytes(table, 'parquet'), file_name='schedules.parquet',
+                                   mime='application/vnd.apache.parquet', key='download_parquet')
+    column_arrow.download_button('Arrow IPC', to_bytes(table, 'arrow'), file_name='schedules.arrow',
+                                 mime='application/vnd.apache.arrow.file', key='download_arrow')
+
 
+if profiling.enabled():
+    profiling.record('app.rerun', time.perf_counter() - RERUN_START)
+    profiling.debug_panel()
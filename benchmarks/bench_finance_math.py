@@ -0,0 +1,35 @@
+import numpy as np
+
+from finance_math import escalation, generate_amortization_schedule, generate_investment_schedule
+from ledger import account, realization_months
+from scenarios import evaluate_scenarios
+
+
+def test_amortization_schedule(benchmark, params):
+    benchmark(generate_amortization_schedule,
+              P=params.apartment_price - params.down_payment, T=params.loan_term, r=params.interest_rate)
+
+
+def test_investment_schedule(benchmark, params):
+    benchmark(generate_investment_schedule,
+              params.down_payment, 300, params.stock_return, params.loan_term + params.time_horizont)
+
+
+def test_indexed_investment_schedule(benchmark, params):
+    # Contribution vector of a yearly raised rent, the discounted cumulative sum
+    years = params.loan_term + params.time_horizont
+    contributions = 300 * escalation(0.03, np.arange(1, years*12 + 1))
+    benchmark(generate_investment_schedule, params.down_payment, contributions, params.stock_return, years)
+
+
+def test_evaluate_scenarios_100k(benchmark):
+    benchmark(evaluate_scenarios, full=False, rent=[850 + i / 100 for i in range(100_000)])
+
+
+def test_tax_lot_ledger(benchmark, params):
+    # Withdrawals every other year and a realization every 5 years, the lots of every period
+    years = params.loan_term + params.time_horizont
+    flows = np.where(np.arange(1, years*12 + 1) % 24 == 0, -5_000.0, 300.0)
+    growth = np.power(1 + params.stock_return, 1/12)
+    benchmark(account, growth, params.down_payment, flows, params.stock_tax,
+              realization_months(5, years*12), allowance=1_000)
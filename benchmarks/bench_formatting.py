@@ -0,0 +1,18 @@
+import numpy as np
+
+from formatting import money, money_array
+
+
+AMOUNTS = np.random.default_rng(0).normal(0, 1e6, 100_000)
+
+
+def test_money_uncached(benchmark):
+    benchmark(money.__wrapped__, -1_234_567.89, cents=True)
+
+
+def test_money_array_100k(benchmark):
+    benchmark(money_array, AMOUNTS)
+
+
+def test_money_array_compact_100k(benchmark):
+    benchmark(money_array, AMOUNTS, compact=True)
@@ -0,0 +1,33 @@
+import pytest
+
+import plotting as plots
+from heatmap import compute_grid
+from sensitivity import sensitivity
+from simulation import simulate
+
+
+FIGURES = {
+    'balance_projection': lambda r: plots.figure_balance_projection(r.mortgage),
+    'apartment_return': lambda r: plots.figure_apartment_return(r.mortgage),
+    'apartment_net_assets': lambda r: plots.figure_apartment_net_assets(r.mortgage),
+    'payment': lambda r: plots.figure_payment(r.mortgage),
+    'renting_net_assets': lambda r: plots.figure_renting_net_assets(r.renting_long),
+    'apartment_net_assets_with_investing': lambda r: plots.figure_apartment_net_assets_with_investing(r.owning_long),
+    'summary': lambda r: plots.figure_summary(r.owning_long, r.renting_long),
+}
+
+
+@pytest.mark.parametrize('name', list(FIGURES))
+def test_figure_to_json(benchmark, params, name):
+    result = simulate(params)
+    benchmark(lambda: FIGURES[name](result).to_json())
+
+
+def test_heatmap_to_json(benchmark, params):
+    grid = compute_grid('rent', 'apartment_return', params.scenario_params())
+    benchmark(lambda: plots.figure_heatmap(grid, marker=(params.rent, params.apartment_return)).to_json())
+
+
+def test_tornado_to_json(benchmark, params):
+    # Every input moved down and up in one batched scenario pass, then the figure
+    benchmark(lambda: plots.figure_tornado(sensitivity(params.scenario_params())).to_json())
@@ -0,0 +1,32 @@
+import inspect
+
+from finance_math import deflator
+from simulation import PIPELINE, in_real_terms, simulate
+
+
+# Without the in-memory and on-disk result caches
+compute = inspect.unwrap(simulate)
+
+
+def test_simulate_uncached(benchmark, params):
+    # The full app.py computation with every stage recomputed
+    benchmark.pedantic(compute, args=(params,), setup=PIPELINE.clear, rounds=50)
+
+
+def test_simulate_tax_change(benchmark, params):
+    # Only the taxed final row of owning_long is recomputed
+    taxes = iter(range(10**9))
+    benchmark(lambda: compute(params._replace(apartment_tax=next(taxes) / 10**9)))
+
+
+def test_simulate_ledger_change(benchmark, params):
+    # The ledger and the schedules after it, e.g. a new stock tax
+    taxes = iter(range(10**9))
+    benchmark(lambda: compute(params._replace(stock_tax=next(taxes) / 10**9)))
+
+
+def test_real_terms(benchmark, params):
+    # The real-terms toggle only rescales the cached nominal schedules
+    result = compute(params)
+    index = deflator(0.02, (params.loan_term + params.time_horizont + 1) * 12)
+    benchmark(in_real_terms, result, index)
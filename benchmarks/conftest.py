@@ -0,0 +1,50 @@
+'''Benchmarks of the finance_math, simulation and plotting hot paths
+
+Every run is saved to benchmarks/.benchmarks, the first saved run is the baseline
+and later runs fail when the median of a benchmark regresses more than
+BENCHMARK_MAX_REGRESSION percent (default 20) from it.
+Delete the directory to record a new baseline.
+
+    pip install -r benchmarks/requirements.txt
+    python -m pytest -c benchmarks/pytest.ini benchmarks
+    BENCHMARK_MAX_REGRESSION=10 python -m pytest -c benchmarks/pytest.ini benchmarks
+'''
+import glob
+import logging
+import os
+import sys
+
+import pytest
+from pytest_benchmark.utils import parse_compare_fail
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+logging.getLogger('streamlit').setLevel(logging.ERROR)
+
+from simulation import Params
+
+
+STORAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.benchmarks')
+MAX_REGRESSION = int(os.environ.get('BENCHMARK_MAX_REGRESSION', 20))
+
+
+# Loan term and time horizont in years
+SIZES = {
+    'small': Params(loan_term=5, time_horizont=1),
+    'typical': Params(),
+    'worst': Params(loan_term=50, time_horizont=100),
+}
+
+
+@pytest.fixture(params=list(SIZES), ids=list(SIZES))
+def params(request):
+    return SIZES[request.param]
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    option = config.option
+    option.benchmark_storage = f'file://{STORAGE}'
+    # Comparing needs a saved baseline, the first run only creates it
+    if option.benchmark_compare_fail is None and glob.glob(os.path.join(STORAGE, '*', '*.json')):
+        option.benchmark_compare = option.benchmark_compare or '0001'
+        option.benchmark_compare_fail = [parse_compare_fail(f'median:{MAX_REGRESSION}%')]
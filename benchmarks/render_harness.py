@@ -0,0 +1,266 @@
+'''Headless rerun latency of the whole app.py page
+
+Runs app.py with Streamlit's local script runner, without a server, browser
+or network, drives the sidebar number inputs (keys '1'-'12') and the section
+checkboxes through scripted sequences and records the wall time of every
+rerun split into computation, markdown formatting, chart building and
+serialization and the rest of the script.
+
+    python benchmarks/render_harness.py --csv rerun.csv --json rerun.json
+    python benchmarks/render_harness.py --sequence horizont --sequence price --repeat 3
+
+Own sequences are given as a JSON file of {"name": [{"key": value, ...}, ...]},
+every step sets the given inputs and reruns the page.
+'''
+import argparse
+import csv
+import functools
+import json
+import logging
+import os
+import sys
+import time
+from unittest.mock import MagicMock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+logging.getLogger('streamlit').setLevel(logging.ERROR)
+
+import streamlit
+from streamlit import config
+from streamlit.proto.WidgetStates_pb2 import WidgetStates
+from streamlit.runtime import Runtime
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.runtime.scriptrunner import ScriptRunnerEvent
+from streamlit.testing.local_script_runner import LocalScriptRunner
+
+import breakeven
+import export
+import finance_math
+import heatmap
+import helpers
+import plotting
+import scenarios
+import sensitivity
+import simulation
+
+
+SCRIPT = os.path.join(ROOT, 'app.py')
+CATEGORIES = ('computation', 'markdown', 'charts', 'other')
+COLUMNS = ('sequence', 'step', 'inputs', 'total_ms') + tuple(f'{category}_ms' for category in CATEGORIES)
+
+SECTIONS = ('Mortgage and Apartment', 'Renting and Investing', 'Longer Timehorizont with Taxes', 'Comparison',
+            'Break-even Heatmap', 'Download the Schedules')
+
+# Every step sets the number inputs or section checkboxes by their key and reruns the page
+SEQUENCES = {
+    'rerun': [{}] * 5,
+    'price': [{'1': price} for price in (100_000, 200_000, 300_000, 400_000, 500_000)],
+    'rates': [{'4': 2.0}, {'4': 6.0}, {'7': 4.0}, {'7': 10.0}, {'9': 2.0}],
+    'horizont': [{'6': years} for years in (1, 10, 25, 50, 100)],
+    'term': [{'3': years} for years in (5, 15, 30, 50)],
+    'all': [{'1': 250_000}, {'2': 50_000}, {'3': 30}, {'4': 3.0}, {'6': 20}, {'7': 6.0},
+            {'8': 300}, {'9': 1.0}, {'10': 1_200}, {'11': 10.0}, {'12': 25.0}],
+    # Opens the page sections one by one, then changes an input with all of them open
+    'sections': [{f'section {title}': True} for title in ('Mortgage and Apartment', 'Renting and Investing',
+                                                         'Longer Timehorizont with Taxes', 'Break-even Heatmap')]
+                + [{'1': 300_000}],
+    # Opens every section alone, so none of them relies on what another one defines
+    'isolated': [{f'section {other}': other == title for other in SECTIONS} for title in SECTIONS],
+}
+
+
+class Timers:
+    '''Wall time spent in the wrapped functions per category during one rerun
+
+    Only the outermost wrapped call is timed,
+    so a category never counts time already counted by another.
+    '''
+    def __init__(self):
+        self.seconds = dict.fromkeys(CATEGORIES, 0.0)
+        self.depth = 0
+
+    def reset(self):
+        self.seconds = dict.fromkeys(CATEGORIES, 0.0)
+
+    def wrap(self, category, func):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            if self.depth:
+                return func(*args, **kwargs)
+            self.depth += 1
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.seconds[category] += time.perf_counter() - start
+                self.depth -= 1
+        return timed
+
+    def install(self):
+        '''Wraps the functions app.py calls, it picks them up on its next import
+
+        st.markdown and st.caption are already bound to the main DeltaGenerator,
+        so they are replaced on the streamlit module instead of the class.
+        '''
+        for module, name in ((simulation, 'simulate'), (simulation, 'in_real_terms'), (finance_math, 'deflator'),
+                             (breakeven, 'solve_break_even'), (heatmap, 'load_grid'), (heatmap, 'interpolate'),
+                             (sensitivity, 'sensitivity'), (scenarios, 'evaluate_scenarios'),
+                             (export, 'result_table'), (export, 'to_bytes')):
+            setattr(module, name, self.wrap('computation', getattr(module, name)))
+        helpers.money_to_string = self.wrap('markdown', helpers.money_to_string)
+        for name in ('markdown', 'caption', 'write'):
+            setattr(streamlit, name, self.wrap('markdown', getattr(streamlit, name)))
+        for name in dir(plotting):
+            if name.startswith('plot_'):
+                setattr(plotting, name, self.wrap('charts', getattr(plotting, name)))
+
+
+def _mock_runtime():
+    '''Stands in for the server Runtime, as Streamlit's own interactive tests do'''
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage('/mock/media'))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = runtime
+    config.set_option('runner.postScriptGC', False)
+
+
+def _widget_states(tree):
+    '''Widget states of the number inputs and checkboxes, the other widgets keep their defaults
+
+    ElementTree.get_widget_states() is not used as the local script runner
+    cannot serialize selectboxes with a format_func.
+    '''
+    states = WidgetStates()
+    if tree is not None:
+        for widget_type in ('number_input', 'checkbox'):
+            states.widgets.extend(widget.widget_state() for widget in tree.get(widget_type))
+    return states
+
+
+def _rerun(tree, timers, timeout):
+    '''Reruns the page with the widget states of the tree, returns the new tree and seconds'''
+    runner = LocalScriptRunner(SCRIPT, tree.session_state if tree is not None else None)
+    stamps = {}
+
+    def record(sender, event, **kwargs):
+        if event == ScriptRunnerEvent.SCRIPT_STARTED:
+            stamps['start'] = time.perf_counter()
+        elif event == ScriptRunnerEvent.SCRIPT_STOPPED_WITH_SUCCESS:
+            stamps['stop'] = time.perf_counter()
+
+    runner.on_event.connect(record, weak=False)
+    timers.reset()
+    tree = runner.run(_widget_states(tree), timeout=timeout)
+    exceptions = tree.get('exception')
+    if exceptions or 'stop' not in stamps:
+        message = exceptions[0].message if exceptions else 'script did not finish'
+        raise RuntimeError(f'app.py failed: {message}')
+    return tree, stamps['stop'] - stamps['start']
+
+
+def run_sequences(sequences, repeat=1, timeout=60):
+    '''Runs the page once and then every step of the sequences
+
+    Parameters
+    ----------
+    sequences : dict
+        Lists of steps by name, a step maps input keys to new values
+    repeat : int
+        Number of times every sequence is run
+    timeout : float
+        Seconds a single rerun may take
+
+    Returns
+    -------
+    rows : list of dict
+        Milliseconds of every rerun, total and per category, see COLUMNS
+    '''
+    _mock_runtime()
+    timers = Timers()
+    timers.install()
+
+    rows = []
+
+    def add_row(sequence, step, inputs, seconds):
+        row = {'sequence': sequence, 'step': step, 'inputs': json.dumps(inputs),
+               'total_ms': seconds * 1000}
+        for category in CATEGORIES[:-1]:
+            row[f'{category}_ms'] = timers.seconds[category] * 1000
+        row['other_ms'] = max(row['total_ms'] - sum(timers.seconds.values()) * 1000, 0.0)
+        rows.append(row)
+
+    try:
+        tree, seconds = _rerun(None, timers, timeout)
+        add_row('initial', 0, {}, seconds)
+        for _ in range(repeat):
+            for name, steps in sequences.items():
+                for step, inputs in enumerate(steps, 1):
+                    for key, value in inputs.items():
+                        widget = tree.get_widget(key)
+                        if widget is None:
+                            raise KeyError(f'No input with key {key!r} in app.py')
+                        widget.set_value(value)
+                    tree, seconds = _rerun(tree, timers, timeout)
+                    add_row(name, step, inputs, seconds)
+    finally:
+        Runtime._instance = None
+    return rows
+
+
+def summarize(rows):
+    '''Mean and maximum milliseconds per sequence, the initial cold run excluded'''
+    summary = {}
+    for row in rows:
+        if row['sequence'] != 'initial':
+            summary.setdefault(row['sequence'], []).append(row)
+    return {name: {column: {'mean': sum(row[column] for row in group) / len(group),
+                            'max': max(row[column] for row in group)}
+                   for column in COLUMNS[3:]}
+            for name, group in summary.items()}
+
+
+def write_csv(rows, path):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_json(rows, path):
+    with open(path, 'w') as f:
+        json.dump({'reruns': rows, 'summary': summarize(rows)}, f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sequence', action='append', choices=list(SEQUENCES),
+                        help='built-in sequence to run, can be repeated (default all of them)')
+    parser.add_argument('--sequences', help='JSON file of own sequences')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--csv', help='path of the CSV report')
+    parser.add_argument('--json', help='path of the JSON report')
+    args = parser.parse_args(argv)
+
+    if args.sequences:
+        with open(args.sequences) as f:
+            sequences = json.load(f)
+    else:
+        sequences = {name: SEQUENCES[name] for name in args.sequence or SEQUENCES}
+
+    rows = run_sequences(sequences, args.repeat, args.timeout)
+    if args.csv:
+        write_csv(rows, args.csv)
+    if args.json:
+        write_json(rows, args.json)
+
+    print(f'{"sequence":<10}' + ''.join(f'{column:>16}' for column in COLUMNS[3:]))
+    for name, stats in summarize(rows).items():
+        print(f'{name:<10}' + ''.join(f'{stats[column]["mean"]:>16.1f}' for column in COLUMNS[3:]))
+
+
+if __name__ == '__main__':
+    main()
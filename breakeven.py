@@ -0,0 +1,71 @@
+import numpy as np
+
+from scenarios import as_parameter_arrays, evaluate_scenarios
+
+
+def net_difference(name, values, params=None, **overrides):
+    '''After-tax net assets of owning minus renting with one parameter replaced'''
+    return evaluate_scenarios(params, full=False, **{**overrides, name: values}).difference
+
+
+def solve_break_even(name, bounds, params=None, xtol=1e-6, maxiter=100, **overrides):
+    '''Finds the value of one parameter where owning and renting end up equal
+
+    The root of the owning minus renting difference is bracketed by bounds
+    and refined with the Illinois variant of false position,
+    which keeps the bracket like bisection but converges superlinearly.
+    Every iteration is one vectorized evaluation of all N parameter sets,
+    so a break-even curve over another parameter costs the same
+    number of iterations as a single point.
+    Integer parameters (loan_term, time_horizont) are treated as continuous.
+
+    Parameters
+    ----------
+    name : str
+        Parameter to solve, from scenarios.PARAMETERS
+    bounds : tuple
+        Lower and upper bound of the bracket, scalars or arrays
+    params : DataFrame or dict, optional
+        N parameter sets, see scenarios.as_parameter_arrays
+    xtol : float
+        Absolute tolerance of the solved value
+    maxiter : int
+        Maximum number of iterations
+    **overrides
+        Individual parameters given as scalars or arrays
+
+    Returns
+    -------
+    root : np.ndarray
+        Break-even value per parameter set, NaN if the bracket has no sign change
+    '''
+    shape = next(iter(as_parameter_arrays(params, **overrides).values())).shape
+    lo, hi = (np.broadcast_to(np.asarray(bound, dtype=float), shape).copy() for bound in bounds)
+    f_lo = net_difference(name, lo, params, **overrides)
+    f_hi = net_difference(name, hi, params, **overrides)
+    valid = np.sign(f_lo) * np.sign(f_hi) <= 0
+
+    root = np.where(f_lo == 0, lo, hi)
+    side = np.zeros(shape, dtype=int)
+    for _ in range(maxiter):
+        active = valid & (np.abs(hi - lo) > xtol) & (f_lo != 0) & (f_hi != 0)
+        if not active.any():
+            break
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x = (lo * f_hi - hi * f_lo) / (f_hi - f_lo)
+        x = np.where(np.isfinite(x) & (x > np.minimum(lo, hi)) & (x < np.maximum(lo, hi)), x, (lo + hi) / 2)
+        x = np.where(active, x, root)
+        f_x = net_difference(name, x, params, **overrides)
+
+        same_as_lo = np.sign(f_x) == np.sign(f_lo)
+        move_lo = active & same_as_lo
+        move_hi = active & ~same_as_lo
+        # Illinois: halve the retained end point when the same side is kept twice
+        f_hi = np.where(move_lo & (side == -1), f_hi / 2, f_hi)
+        f_lo = np.where(move_hi & (side == 1), f_lo / 2, f_lo)
+        lo, f_lo = np.where(move_lo, x, lo), np.where(move_lo, f_x, f_lo)
+        hi, f_hi = np.where(move_hi, x, hi), np.where(move_hi, f_x, f_hi)
+        side = np.where(move_lo, -1, np.where(move_hi, 1, side))
+        root = np.where(active, x, root)
+
+    return np.where(valid, root, np.nan)
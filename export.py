@@ -0,0 +1,187 @@
+'''Parquet and Arrow IPC export of the schedules behind the charts
+
+A single scenario is written as one long table of all the page's frames,
+a batch of scenarios as their monthly paths over the outer product of the
+given parameter axes, streamed in row groups of batch_size scenarios.
+
+    python export.py --rent 500:2000:31 --interest_rate 0.01:0.08:8 --output batch.parquet
+    python export.py --apartment_price 100000:500000:5 --output batch.arrow
+'''
+import argparse
+import json
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from scenarios import DEFAULTS, MODEL_VERSION, PARAMETERS, evaluate_scenarios
+from sweep import parse_axis
+
+
+# Schedules of simulation.Result in the order of the page
+FRAMES = ('mortgage', 'renting', 'owning_long', 'renting_long')
+MONEY_COLUMNS = ('Payment', 'Principal', 'Interest', 'Balance', 'Condominium', 'Apartment', 'ApartmentGain',
+                 'Contributions', 'NetAssets')
+
+SCHEMA = pa.schema(
+    [pa.field('frame', pa.dictionary(pa.int8(), pa.string()), nullable=False),
+     pa.field('Year', pa.int16(), nullable=False),
+     pa.field('Month', pa.int16(), nullable=False)]
+    + [pa.field(name, pa.float64()) for name in MONEY_COLUMNS])
+
+# Monthly paths of scenarios.ScenarioResult, the final values repeat on every row of a scenario
+PATHS = ('loan_balance', 'apartment_value', 'owner_investment', 'renter_investment',
+         'owner_net_assets', 'renter_net_assets')
+FINALS = ('owner_final', 'renter_final')
+
+BATCH_SCHEMA = pa.schema(
+    [pa.field('scenario', pa.int64(), nullable=False),
+     pa.field('Month', pa.int16(), nullable=False)]
+    + [pa.field(name, pa.float64(), nullable=False) for name in PARAMETERS + PATHS + FINALS])
+
+
+def _metadata(**values):
+    return {key: json.dumps(value) for key, value in {'model_version': MODEL_VERSION, **values}.items()}
+
+
+def schedule_table(name, schedule):
+    '''Arrow table of one simulation.Schedule with the columns of SCHEMA
+
+    The contiguous NumPy columns are wrapped without copying,
+    only the constant broadcast columns are materialized.
+    '''
+    n = len(schedule)
+    columns = {
+        'frame': pa.DictionaryArray.from_arrays(pa.array(np.full(n, FRAMES.index(name), dtype=np.int8)),
+                                                pa.array(FRAMES)),
+        'Year': pa.array(schedule['Year']),
+        'Month': pa.array(schedule['Month']),
+    }
+    for column in MONEY_COLUMNS:
+        if column in schedule.columns:
+            columns[column] = pa.array(np.ascontiguousarray(schedule[column], dtype=np.float64))
+        else:
+            columns[column] = pa.nulls(n, pa.float64())
+    return pa.Table.from_pydict(columns, schema=SCHEMA)
+
+
+def result_table(result, params):
+    '''All frames of a simulation.Result in one table, the inputs in its metadata
+
+    Parameters
+    ----------
+    result : simulation.Result
+        Simulated schedules
+    params : simulation.Params
+        Inputs of the simulation
+    '''
+    table = pa.concat_tables([schedule_table(name, getattr(result, name)) for name in FRAMES])
+    metadata = _metadata(params=params._asdict(), frames=FRAMES,
+                         cash_flows={'fcf': float(result.fcf), 'fcf_rent': float(result.fcf_rent)})
+    return table.replace_schema_metadata(metadata)
+
+
+def _writer(path, schema, file_format=None):
+    '''Parquet or Arrow IPC file writer chosen by the file_format or the extension'''
+    file_format = file_format or ('parquet' if os.path.splitext(str(path))[1] in ('.parquet', '.pq') else 'arrow')
+    if file_format == 'parquet':
+        return pq.ParquetWriter(path, schema, compression='zstd')
+    if file_format == 'arrow':
+        return pa.ipc.new_file(path, schema)
+    raise ValueError(f'Unknown export format: {file_format}')
+
+
+def write_table(table, path, file_format=None):
+    '''Writes a table to a path or file object as Parquet or Arrow IPC'''
+    with _writer(path, table.schema, file_format) as writer:
+        writer.write_table(table)
+
+
+def to_bytes(table, file_format):
+    '''The table as a Parquet or Arrow IPC file in memory, e.g. for a download button'''
+    sink = pa.BufferOutputStream()
+    write_table(table, sink, file_format)
+    return sink.getvalue().to_pybytes()
+
+
+def _batch_table(params, result):
+    '''Rows of every month inside the horizon of every scenario of one chunk'''
+    scenario, month = np.nonzero(~np.isnan(result.loan_balance))
+    columns = {'scenario': scenario, 'Month': (month + 1).astype(np.int16)}
+    columns.update((name, params[name][scenario]) for name in PARAMETERS)
+    columns.update((name, getattr(result, name)[scenario, month]) for name in PATHS)
+    columns.update((name, getattr(result, name)[scenario]) for name in FINALS)
+    return columns
+
+
+def export_batch(axes, path, fixed=None, batch_size=1_000, file_format=None):
+    '''Streams the monthly paths of every combination of the axes to a file
+
+    The grid is evaluated batch_size scenarios at a time and every batch
+    is written as its own row group (Parquet) or record batch (Arrow IPC),
+    so memory stays bounded by one batch however large the grid is.
+
+    Parameters
+    ----------
+    axes : dict
+        Values of every varied parameter, the scenarios are their outer product
+    path : str
+        Output file, .parquet or .pq for Parquet and Arrow IPC otherwise
+    fixed : dict, optional
+        Other parameters, missing ones use DEFAULTS
+    batch_size : int
+        Scenarios per row group
+    file_format : str, optional
+        'parquet' or 'arrow', overrides the extension
+
+    Returns
+    -------
+    rows : int
+        Number of written rows
+    '''
+    fixed = {name: value for name, value in (fixed or {}).items() if name not in axes}
+    unknown = (set(axes) | set(fixed)) - set(PARAMETERS)
+    if unknown:
+        raise KeyError(f'Unknown parameters: {sorted(unknown)}')
+    axes = {name: np.asarray(values, dtype=float) for name, values in axes.items()}
+    shape = tuple(len(values) for values in axes.values())
+    n = int(np.prod(shape))
+
+    schema = BATCH_SCHEMA.with_metadata(_metadata(
+        axes={name: values.tolist() for name, values in axes.items()},
+        fixed={**DEFAULTS, **fixed}, paths=PATHS, finals=FINALS))
+    rows = 0
+    with _writer(path, schema, file_format) as writer:
+        for start in range(0, n, batch_size):
+            index = np.unravel_index(np.arange(start, min(start + batch_size, n)), shape)
+            params = {name: np.full(len(index[0]), float(fixed.get(name, DEFAULTS[name]))) for name in PARAMETERS}
+            params.update((name, axes[name][i]) for name, i in zip(axes, index))
+            columns = _batch_table(params, evaluate_scenarios(params))
+            columns['scenario'] = columns['scenario'] + start
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            rows += len(columns['scenario'])
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    for name in PARAMETERS:
+        parser.add_argument(f'--{name}', type=parse_axis, help=f'start:stop:num or a,b,c (default {DEFAULTS[name]})')
+    parser.add_argument('--output', default='scenarios.parquet')
+    parser.add_argument('--format', choices=('parquet', 'arrow'), default=None)
+    parser.add_argument('--batch-size', type=int, default=1_000)
+    args = parser.parse_args(argv)
+
+    values = {name: getattr(args, name) for name in PARAMETERS if getattr(args, name) is not None}
+    axes = {name: axis for name, axis in values.items() if len(axis) > 1}
+    fixed = {name: axis[0] for name, axis in values.items() if len(axis) == 1}
+    if not axes:
+        parser.error('give at least one parameter with several values')
+
+    rows = export_batch(axes, args.output, fixed, args.batch_size, args.format)
+    print(f'{rows:,} rows of {int(np.prod([len(axis) for axis in axes.values()])):,} scenarios -> {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,10 @@
+import functools
+
 import pandas as pd
 import numpy as np
 
+from profiling import timed
+
 
 def __calculate_monthly_payment(P, T, r):
     '''Computes the monthly payment of Amortized loan
@@ -13,54 +17,396 @@ def __calculate_monthly_payment(P, T, r):
     https://teachingcalculus.com/2015/02/09/amortization/
 
     Nominal Yearly interest rate is compounded monthly -> r/12.
+    With zero interest the series degenerates to equal instalments P / (12T).
 
     Parameters
     ----------
-    P : int
+    P : int or array_like
         Principal of the loan
-    T : int
+    T : int or array_like
         Maturity of the loan in years
-    r : float
+    r : float or array_like
         Nominal annual interest rate (value that reads on the contract)
     '''
-    t_months = T * 12
-    r_monthly = r / 12
-    A = P*r_monthly*(1 + r_monthly) ** t_months / ((1 + r_monthly) ** t_months - 1)
-    return A
+    t_months = np.asarray(T) * 12
+    r_monthly = np.asarray(r) / 12
+    with np.errstate(divide='ignore', invalid='ignore'):
+        A = P*r_monthly*(1 + r_monthly) ** t_months / ((1 + r_monthly) ** t_months - 1)
+    return np.where(r_monthly == 0, P / t_months, A)[()]
+
+
+def remaining_balance(P, t_months, r, elapsed):
+    '''Computes the outstanding balance of Amortized loan after elapsed payments
 
+    The balance after k payments is the future value of the principal
+    minus the future value of the already paid annuity,
+    which simplifies to the remaining share of the geometrical series:
+        B_k = P((1 + r/12)^n - (1 + r/12)^k) / ((1 + r/12)^n - 1)
+    The parameters broadcast against each other,
+    so the balance can be evaluated for any set of months without the others.
+
+    Parameters
+    ----------
+    P : int or array_like
+        Principal of the loan
+    t_months : int or array_like
+        Maturity of the loan in months
+    r : float or array_like
+        Nominal annual interest rate (value that reads on the contract)
+    elapsed : int or array_like
+        Number of paid instalments, the balance is zero past the maturity
+    '''
+    r_monthly = np.asarray(r) / 12
+    elapsed = np.minimum(elapsed, t_months)
+    growth = np.power(1 + r_monthly, elapsed)
+    growth_end = np.power(1 + r_monthly, t_months)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        remaining = np.where(r_monthly == 0,
+                             (t_months - elapsed) / t_months,
+                             (growth_end - growth) / (growth_end - 1))
+    return P * remaining
+
+
+@timed
+def amortization_columns(P, T, r, n_months=None):
+    '''Computes the amortization schedule columns for every month at once
+
+    The balance follows the closed form of remaining_balance
+    and the interest of month k is accrued on the previous balance B_(k-1).
+    All months are evaluated with cumulative powers of (1 + r/12),
+    so the cost does not depend on a Python loop over the term.
+
+    The parameters broadcast against each other,
+    so arrays of N loans produce (N, n_months) columns.
+    Months past the maturity of a loan are zero.
+
+    Parameters
+    ----------
+    P : int or array_like
+        Principal of the loan
+    T : int or array_like
+        Maturity of the loan in years
+    r : float or array_like
+        Nominal annual interest rate (value that reads on the contract)
+    n_months : int, optional
+        Length of the returned columns, defaults to the longest maturity
+
+    Returns
+    -------
+    columns : dict
+        Month (n_months,) and Payment, Principal, Interest, Balance
+        with shape broadcast(P, T, r) + (n_months,)
+    '''
+    P, T, r = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (P, T, r)))
+    t_months = (T * 12)[..., None]
+    if n_months is None:
+        n_months = int(t_months.max(initial=0))
+    r_monthly = (r / 12)[..., None]
+    payment = __calculate_monthly_payment(P, T, r)[..., None]
+
+    elapsed = np.arange(0, n_months + 1)
+    balance = remaining_balance(P[..., None], t_months, r[..., None], elapsed)
+
+    active = elapsed[1:] <= t_months
+    interest = np.where(active, balance[..., :-1] * r_monthly, 0.0)
+    payment = np.where(active, payment, 0.0)
+    return {
+        'Month': elapsed[1:],
+        'Payment': payment,
+        'Principal': payment - interest,
+        'Interest': interest,
+        'Balance': np.where(active, balance[..., 1:], 0.0),
+    }
+
+
+def rate_path(r, resets, t_months):
+    '''Monthly nominal rates of a loan starting at r and reset at the given months
+
+    Parameters
+    ----------
+    r : float
+        Nominal annual interest rate of the first months
+    resets : iterable of (int, float)
+        Month of the reset and the new nominal annual rate from that month on
+    t_months : int
+        Maturity of the loan in months
+    '''
+    rates = np.full(int(t_months), float(r))
+    for month, rate in sorted(resets):
+        rates[int(month):] = rate
+    return rates
+
+
+@functools.lru_cache(maxsize=256)
+def __amortization_segment(balance, t_months, r, length):
+    '''Payment, interest and balance of the first months of a loan re-amortized at a reset
+
+    Cached by its arguments, so a segment is only recomputed
+    when its starting balance, remaining term or rate changed.
+    The returned arrays are shared between the calls and read-only.
+    '''
+    elapsed = np.arange(0, length + 1)
+    balances = remaining_balance(balance, t_months, r, elapsed)
+    payment = np.full(length, __calculate_monthly_payment(balance, t_months / 12, r))
+    segment = payment, balances[:-1] * r / 12, balances[1:]
+    for values in segment:
+        values.flags.writeable = False
+    return segment
+
+
+@timed
+def variable_amortization_columns(P, T, rates, prepayments=()):
+    '''Computes the amortization schedule columns of a variable-rate loan
+
+    The rate path is split into segments of a constant rate
+    and at the start of every segment the outstanding balance is
+    re-amortized over the remaining term with the new rate,
+    as Euribor-linked loans do at their reset dates.
+    A prepayment also starts a segment, it is paid together with
+    the instalment of its month and the lower balance is re-amortized
+    over the same remaining term, so the later instalments decrease.
+    Every segment is evaluated at once with the closed form of remaining_balance
+    and cached, so editing a future rate recomputes only the segments
+    from that reset on, the earlier ones start from the same balance.
+    A constant rate path equals amortization_columns.
+
+    Parameters
+    ----------
+    P : float
+        Principal of the loan
+    T : int
+        Maturity of the loan in years
+    rates : float or array_like
+        Nominal annual interest rate of every month, see rate_path
+    prepayments : iterable of (int, float), optional
+        Month of the prepayment and its amount, capped at the outstanding balance
+
+    Returns
+    -------
+    columns : dict
+        Month, Payment, Principal, Interest, Balance and Prepayment of every month
+    '''
+    t_months = int(T * 12)
+    rates = np.broadcast_to(np.asarray(rates, dtype=float), (t_months,))
+    prepaid = {int(month): float(amount) for month, amount in prepayments if 0 < month < t_months}
+    bounds = np.union1d(np.flatnonzero(np.diff(rates)) + 1, list(prepaid))
+    bounds = np.concatenate(([0], bounds, [t_months])).astype(int)
+
+    payment, interest, balance, prepayment = np.zeros((4, t_months))
+    remaining = float(P)
+    for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        if start in prepaid:
+            prepayment[start - 1] = min(prepaid[start], remaining)
+            balance[start - 1] = remaining = remaining - prepayment[start - 1]
+        segment = __amortization_segment(remaining, t_months - start, float(rates[start]), end - start)
+        payment[start:end], interest[start:end], balance[start:end] = segment
+        remaining = float(balance[end - 1])
+    return {
+        'Month': np.arange(1, t_months + 1),
+        'Payment': payment,
+        'Principal': payment - interest,
+        'Interest': interest,
+        'Balance': balance,
+        'Prepayment': prepayment,
+    }
+
+
+@timed
 def generate_amortization_schedule(P, T ,r):
-    yearly_payment = __calculate_monthly_payment(P, T ,r)
-    schedule = []
-    balance = P
-    for month in range(1, T*12 + 1):
-        interest_payment = balance * (r/12)
-        principal_payment = yearly_payment - interest_payment
-        balance -= principal_payment
-        schedule.append({
-                'Year' : np.ceil(month/12).astype(int),
-                'Month': month,
-                'Payment' : yearly_payment,
-                'Principal' : principal_payment,
-                'Interest' : interest_payment,
-                'Balance' : balance     
-            })
-    return pd.DataFrame(schedule).round(0)
+    columns = amortization_columns(P, T, r)
+    schedule = pd.DataFrame({'Year': np.ceil(columns['Month'] / 12).astype(int)})
+    for name, values in columns.items():
+        schedule[name] = values
+    return schedule.round(0)
+
+
+def escalation(rate, months):
+    '''Indexation factor of a monthly amount that is raised once a year
+
+    The amount of month m, counted from 1, has been raised at the start
+    of every year before it: (1 + rate)^floor((m - 1) / 12).
+
+    Parameters
+    ----------
+    rate : float or array_like
+        Yearly raise of the amount
+    months : int or array_like
+        Month numbers starting from 1
+    '''
+    years = np.maximum(np.asarray(months) - 1, 0) // 12
+    return np.power(1 + np.asarray(rate, dtype=float), years)
+
+
+def deflator(inflation, months):
+    '''Value of a dollar of every month in the dollars of month zero
+
+    The factor of month m is (1 + inflation)^(-m/12) for m = 0 ... months,
+    so deflator[month] * column is a nominal column in real terms.
+
+    Parameters
+    ----------
+    inflation : float
+        Yearly inflation
+    months : int
+        Last month of the index
+    '''
+    return np.power(1 + float(inflation), -np.arange(months + 1) / 12)
+
+
+def __indexed_annuity(g, E, elapsed):
+    '''Sum and future value of a monthly contribution of one raised by E every year
+
+    Every full year y adds an annuity of 12 months raised by E^y and compounded
+    over the later years, so the full years sum to a geometric series
+    and the started year adds a partial annuity, with G = g^12 and k = 12Y + p:
+        FV_k = a_12 g^p (G^Y - E^Y) / (G - E) + E^Y a_p
+    '''
+    years, rest = np.divmod(elapsed, 12)
+    G = np.power(g, 12)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a_12 = np.where(g == 1, 12, (G - 1) / (g - 1))
+        a_p = np.where(g == 1, rest, (np.power(g, rest) - 1) / (g - 1))
+        full_years = np.where(np.isclose(G, E, rtol=1e-12, atol=0),
+                              years * np.power(G, years - 1),
+                              (np.power(G, years) - np.power(E, years)) / (G - E))
+        paid_years = np.where(E == 1, years, (np.power(E, years) - 1) / (E - 1))
+    raised = np.power(E, years)
+    return 12 * paid_years + rest * raised, a_12 * np.power(g, rest) * full_years + raised * a_p
+
+
+@timed
+def investment_columns(initial_value, monthy_value, r_early, months, indexation=0.0):
+    '''Computes the investment balance after the given months in closed form
+
+    The balance is the compounded initial value plus
+    the future value of an annuity of the monthly contributions:
+        B_k = I g^k + m (g^k - 1) / (g - 1),  g = (1 + r)^(1/12)
+    where the contribution is added after each month's growth.
+    With an indexation the contribution is raised once a year, see escalation,
+    and the annuity becomes a geometric series over the years.
+    The parameters broadcast against each other and months can be any array,
+    so N portfolios are evaluated at once without a Python loop over time.
+    Month zero holds the initial value and negative months,
+    for an investment that has not started yet, are zero.
 
+    Parameters
+    ----------
+    initial_value : float or array_like
+        Invested amount at month zero
+    monthy_value : float or array_like
+        Contribution at the end of every month, of the first year when indexed
+    r_early : float or array_like
+        Effective annual return
+    months : int or array_like
+        Number of elapsed months
+    indexation : float or array_like, optional
+        Yearly raise of the contribution
+
+    Returns
+    -------
+    columns : dict
+        Contributions, Interest and Balance with the broadcast shape
+    '''
+    r_month = np.power(np.asarray(r_early) + 1, 1/12)
+    months = np.asarray(months)
+    elapsed = np.maximum(months, 0)
+    growth = np.power(r_month, elapsed)
+    if np.any(indexation):
+        paid, annuity = __indexed_annuity(r_month, np.asarray(indexation) + 1, elapsed)
+    else:
+        paid = elapsed
+        with np.errstate(divide='ignore', invalid='ignore'):
+            annuity = np.where(r_month == 1, elapsed, (growth - 1) / (r_month - 1))
+    started = months >= 0
+    contributions = np.where(started, initial_value + monthy_value * paid, 0.0)
+    balance = np.where(started, initial_value * growth + monthy_value * annuity, 0.0)
+    return {
+        'Contributions': contributions,
+        'Interest': balance - contributions,
+        'Balance': balance,
+    }
+
+
+@timed
+def investment_flow_columns(initial_value, contributions, r_early):
+    '''Computes the investment balance of a different contribution every month
+
+    The balance follows B_k = g B_(k-1) + c_k, which discounted to month zero
+    is a cumulative sum of the discounted contributions:
+        B_k = g^k (I + sum_(j<=k) c_j g^-j),  g = (1 + r)^(1/12)
+    so any contribution path, e.g. an indexed rent, is evaluated
+    with one np.cumsum instead of a Python loop over the months.
+    Constant contributions equal investment_columns.
+
+    Parameters
+    ----------
+    initial_value : float or array_like
+        Invested amount at month zero
+    contributions : array_like
+        Contribution at the end of months 1, 2, ... along the last axis
+    r_early : float or array_like
+        Effective annual return
+
+    Returns
+    -------
+    columns : dict
+        Contributions, Interest and Balance of months 1, 2, ...
+        with the shape of contributions broadcast against the other parameters
+    '''
+    contributions = np.asarray(contributions, dtype=float)
+    initial_value = np.asarray(initial_value, dtype=float)[..., None]
+    r_month = np.power(np.asarray(r_early, dtype=float) + 1, 1/12)[..., None]
+    growth = np.power(r_month, np.arange(1, contributions.shape[-1] + 1))
+    balance = growth * (initial_value + np.cumsum(contributions / growth, axis=-1))
+    paid = initial_value + np.cumsum(contributions, axis=-1)
+    return {
+        'Contributions': paid,
+        'Interest': balance - paid,
+        'Balance': balance,
+    }
 
+
+def __investment_frame(initial_value, monthy_value, r_early, months):
+    schedule = pd.DataFrame({'Year': np.ceil(months / 12).astype(int), 'Month': months})
+    if np.ndim(monthy_value):
+        columns = investment_flow_columns(initial_value, monthy_value, r_early)
+    else:
+        columns = investment_columns(initial_value, monthy_value, r_early, months)
+    for name, values in columns.items():
+        schedule[name] = values
+    return schedule.round(0)
+
+
+@timed
 def generate_investment_schedule(initial_value, monthy_value, r_early, T):
-    r_month = np.power(r_early + 1, 1/12)
-    schedule = []
-    balance = initial_value
-    contributions = initial_value
-    for month in range(1, T*12 + 1):
-        balance = balance * r_month 
-        balance = balance + monthy_value
-        contributions += monthy_value
-        schedule.append({
-                'Year' : np.ceil(month/12).astype(int),
-                'Month': month,
-                'Contributions': contributions,
-                'Interest': balance - contributions,
-                'Balance': balance
-            })
-    return pd.DataFrame(schedule).round(0)
\ No newline at end of file
+    '''Monthly investment schedule, monthy_value is a scalar or the contribution of every month'''
+    months = np.arange(1, T*12 + 1)
+    if np.ndim(monthy_value):
+        monthy_value = np.asarray(monthy_value)[:len(months)]
+    return __investment_frame(initial_value, monthy_value, r_early, months)
+
+
+def iter_investment_schedule(initial_value, monthy_value, r_early, T, chunk_months=12):
+    '''Yields the investment schedule in consecutive chunks
+
+    Every chunk is evaluated directly from the closed form of investment_columns,
+    so no state is carried between chunks and only one chunk is in memory at a time.
+    Concatenating all chunks equals generate_investment_schedule.
+
+    Parameters
+    ----------
+    initial_value : float
+        Invested amount at month zero
+    monthy_value : float
+        Contribution at the end of every month
+    r_early : float
+        Effective annual return
+    T : int
+        Investment horizon in years
+    chunk_months : int
+        Number of months per yielded frame, 12 for yearly and 1 for monthly chunks
+    '''
+    t_months = T * 12
+    for start in range(1, t_months + 1, chunk_months):
+        months = np.arange(start, min(start + chunk_months, t_months + 1))
+        yield __investment_frame(initial_value, monthy_value, r_early, months)
@@ -0,0 +1,171 @@
+'''Money formatting for the page texts, hover labels and tables
+
+Formatting never depends on the locale, the thousands separator
+is always ',' and the decimal point '.', as in the page texts.
+'''
+import functools
+import math
+
+import numpy as np
+
+
+CACHE_SIZE = 1024
+SUFFIXES = ((1e9, 'B'), (1e6, 'M'), (1e3, 'k'))
+# Largest number of formatted units the int64 digits of money_array can hold,
+# larger amounts (about 9e16 dollars with cents) are formatted by money()
+MAX_UNITS = 2**62
+# Below this many amounts the cached money() is faster than the fixed cost of the array operations
+LOOP_SIZE = 256
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def money(amount, cents=False, compact=False, markdown=False):
+    '''Formats an amount of money, e.g. -$1,234 or $1.2M
+
+    Parameters
+    ----------
+    amount : float
+        Amount in dollars
+    cents : bool
+        Shows the cents, otherwise whole dollars are shown,
+        truncated towards zero like the page has always done
+    compact : bool
+        Abbreviates thousands, millions and billions with k, M and B
+    markdown : bool
+        Escapes the dollar sign, which Streamlit markdown reads as LaTeX
+    '''
+    dollar = '\\$' if markdown else '$'
+    if not math.isfinite(amount):
+        return f'{dollar}{amount}'
+    magnitude = abs(amount)
+    digits = f'{magnitude:,.2f}' if cents else f'{int(magnitude):,}'
+    if compact:
+        for scale, suffix in SUFFIXES:
+            if round(magnitude / scale, 1) >= 1:
+                digits = f'{magnitude / scale:.{2 if cents else 1}f}{suffix}'
+                break
+    # No sign for amounts that show as zero
+    sign = '-' if amount < 0 and digits.strip('0.,') else ''
+    return f'{sign}{dollar}{digits}'
+
+
+def __format_units(units, decimals, grouped, prefix, negative, suffix=None):
+    '''Formats non-negative integers of 10^-decimals dollars without a loop over the values
+
+    The digits are cut out of the integers arithmetically into a
+    (values, characters) byte matrix, right aligned with the thousands separators,
+    the decimal point and the sign and dollar prefix placed in front of the
+    first digit, and every row is then shifted left over its padding.
+    NUL padding is dropped by NumPy's bytes dtype, so the rows view as strings.
+    '''
+    units = np.asarray(units, dtype=np.int64).ravel()
+    whole, fraction = np.divmod(units, 10 ** decimals)
+    n_digits = len(str(whole.max(initial=0)))
+    powers = 10 ** np.arange(n_digits - 1, -1, -1, dtype=np.int64)
+    digits = (whole[:, None] // powers) % 10 + ord('0')
+    significant = (whole[:, None] >= powers) | (powers == 1)
+
+    columns, visible = [], []
+    for i, power in enumerate(powers):
+        columns.append(digits[:, i])
+        visible.append(significant[:, i])
+        if grouped and power in (10 ** 3, 10 ** 6, 10 ** 9, 10 ** 12, 10 ** 15, 10 ** 18):
+            columns.append(np.full(len(units), ord(',')))
+            visible.append(significant[:, i])
+    if decimals:
+        columns.append(np.full(len(units), ord('.')))
+        visible.append(np.ones(len(units), dtype=bool))
+        for power in 10 ** np.arange(decimals - 1, -1, -1, dtype=np.int64):
+            columns.append((fraction // power) % 10 + ord('0'))
+            visible.append(np.ones(len(units), dtype=bool))
+    if suffix is not None:
+        columns.append(suffix)
+        visible.append(suffix != 0)
+    visible = np.stack(visible, axis=1)
+    chars = np.where(visible, np.stack(columns, axis=1), 0).astype(np.uint8)
+
+    # Prefix in front of the first visible column, the sign in front of it for negatives
+    prefix = np.frombuffer(prefix, dtype=np.uint8)
+    start = visible.argmax(axis=1) + len(prefix) + 1
+    chars = np.concatenate((np.zeros((len(units), len(prefix) + 1), dtype=np.uint8), chars), axis=1)
+    rows = np.arange(len(units))
+    for i, char in enumerate(prefix):
+        chars[rows, start - len(prefix) + i] = char
+    chars[rows[negative.ravel()], start[negative.ravel()] - len(prefix) - 1] = ord('-')
+    offset = start - len(prefix) - negative.ravel()
+
+    # Shifts every row left by its offset, columns past the end become NUL
+    gather = np.arange(chars.shape[1]) + offset[:, None]
+    chars = np.where(gather < chars.shape[1], chars[rows[:, None], np.minimum(gather, chars.shape[1] - 1)], 0)
+    return np.ascontiguousarray(chars).view(f'S{chars.shape[1]}').ravel().astype(str)
+
+
+def __product_error(a, b, product):
+    '''Exact rounding error of the float product a * b, Dekker's TwoProduct'''
+    def split(x):
+        c = 134217729.0 * x  # 2^27 + 1
+        high = c - (c - x)
+        return high, x - high
+    a_high, a_low = split(a)
+    b_high, b_low = split(b)
+    return ((a_high * b_high - product) + a_high * b_low + a_low * b_high) + a_low * b_low
+
+
+def __round_units(values, decimals):
+    '''Rounds non-negative values to integers of 10^-decimals as format() and round() do
+
+    Python rounds the exact binary value half to even, so 0.015 (just below
+    the half) becomes 0.01. The scaled float product 1.5 looks like a tie,
+    so its exact rounding error decides the direction instead.
+    '''
+    scale = 10.0 ** decimals
+    product = values * scale
+    units = np.rint(product)
+    remainder = product - units
+    error = __product_error(values, scale, product)
+    return units + ((remainder == 0.5) & (error > 0)) - ((remainder == -0.5) & (error < 0))
+
+
+def money_array(amounts, cents=False, compact=False, markdown=False):
+    '''Vectorized money() for whole arrays, e.g. hover labels and table columns
+
+    Every value is formatted as money() would, without a Python loop over the values.
+    Only the non-finite amounts and the ones beyond MAX_UNITS are passed to money() one by one,
+    and arrays of fewer than LOOP_SIZE amounts, e.g. the labels of a bar chart.
+
+    Returns
+    -------
+    text : np.ndarray
+        Formatted amounts of the same shape
+    '''
+    amounts = np.asarray(amounts, dtype=float)
+    if amounts.size < LOOP_SIZE:
+        return np.array([money(float(amount), cents, compact, markdown) for amount in amounts.ravel()],
+                        dtype=str).reshape(amounts.shape)
+    prefix = b'\\$' if markdown else b'$'
+    decimals = 2 if cents else 0
+    special = ~np.isfinite(amounts) | (np.abs(amounts) * 10 ** decimals >= MAX_UNITS)
+    finite = ~special
+    magnitude = np.where(finite, np.abs(amounts), 0.0).ravel()
+
+    units = __round_units(magnitude, 2) if cents else np.trunc(magnitude)
+    text = __format_units(units, decimals, True, prefix, ((amounts < 0) & finite).ravel() & (units > 0))
+    if compact:
+        scaled = np.zeros_like(magnitude)
+        suffix = np.zeros(magnitude.shape, dtype=np.uint8)
+        for scale, letter in SUFFIXES[::-1]:
+            abbreviate = __round_units(magnitude / scale, 1) >= 10
+            scaled = np.where(abbreviate, magnitude / scale, scaled)
+            suffix = np.where(abbreviate, ord(letter), suffix)
+        units = __round_units(scaled, 2 if cents else 1)
+        decimals = 2 if cents else 1
+        negative = ((amounts < 0) & finite).ravel() & (units > 0)
+        abbreviated = __format_units(units, decimals, False, prefix, negative, suffix)
+        text = np.where(suffix != 0, abbreviated, text)
+
+    text = text.reshape(amounts.shape)
+    if special.any():
+        labels = [money(float(amount), cents, compact, markdown) for amount in amounts[special]]
+        text = text.astype(f'U{max(text.itemsize // 4, *map(len, labels))}')
+        text[special] = labels
+    return text
@@ -0,0 +1,149 @@
+'''Precomputed grids of owning minus renting net assets over two parameters
+
+    python heatmap.py --x rent --y apartment_return
+'''
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+from typing import NamedTuple
+
+import numpy as np
+
+from scenarios import DEFAULTS, MODEL_VERSION, PARAMETERS, evaluate_scenarios
+
+
+CACHE_DIR = os.environ.get('HEATMAP_CACHE_DIR',
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'heatmaps'))
+RESOLUTION = 81
+MAX_FILES = 1_000
+
+# Axis range and display label with the scale from the stored value
+AXES = {
+    'apartment_price': ((50_000, 1_000_000), 'Apartment purchasing price [$]', 1),
+    'down_payment': ((0, 200_000), 'Down Payment [$]', 1),
+    'loan_term': ((5, 50), 'Mortgage Term [Years]', 1),
+    'interest_rate': ((0.0, 0.10), 'Interest rate [%]', 100),
+    'apartment_condo': ((0, 1_000), 'Condominium Fee / Maintenance [$]', 1),
+    'apartment_return': ((-0.03, 0.08), 'Apartment price Return [%]', 100),
+    'apartment_tax': ((0.0, 0.5), 'Apartment Gain Tax[%]', 100),
+    'rent': ((200, 3_000), 'Rent [$]', 1),
+    'time_horizont': ((1, 50), 'Time Horizont [Years]', 1),
+    'stock_return': ((0.0, 0.12), 'Investments Return [%]', 100),
+    'stock_tax': ((0.0, 0.5), 'Capital Asset Gain Tax[%]', 100),
+    'rent_growth': ((0.0, 0.08), 'Rent Increase [%/year]', 100),
+    'condo_growth': ((0.0, 0.08), 'Condominium Fee Increase [%/year]', 100),
+}
+
+
+class Grid(NamedTuple):
+    '''Owning minus renting after-tax net assets, z[i, j] at (x[j], y[i])'''
+    x_name: str
+    y_name: str
+    x: np.ndarray
+    y: np.ndarray
+    z: np.ndarray
+
+
+def grid_key(x_name, y_name, fixed, resolution=RESOLUTION):
+    '''Hash of everything the grid depends on, the name of its cache file'''
+    fixed = {name: float(value) for name, value in sorted({**DEFAULTS, **fixed}.items())
+             if name not in (x_name, y_name)}
+    spec = [MODEL_VERSION, x_name, y_name, AXES[x_name][0], AXES[y_name][0], resolution, fixed]
+    return hashlib.sha1(json.dumps(spec).encode()).hexdigest()
+
+
+def compute_grid(x_name, y_name, fixed=None, resolution=RESOLUTION):
+    '''Evaluates the dense grid in one vectorized pass of evaluate_scenarios'''
+    if x_name == y_name or not {x_name, y_name} <= set(PARAMETERS):
+        raise ValueError(f'Invalid heatmap axes: {x_name}, {y_name}')
+    fixed = {name: value for name, value in (fixed or {}).items() if name not in (x_name, y_name)}
+    x = np.linspace(*AXES[x_name][0], resolution)
+    y = np.linspace(*AXES[y_name][0], resolution)
+    xx, yy = np.meshgrid(x, y)
+    result = evaluate_scenarios(full=False, **fixed, **{x_name: xx.ravel(), y_name: yy.ravel()})
+    return Grid(x_name, y_name, x, y, result.difference.reshape(xx.shape))
+
+
+def load_grid(x_name, y_name, fixed=None, resolution=RESOLUTION, cache_dir=None):
+    '''Loads the grid from the on-disk cache, computing and storing it on a miss
+
+    The grids are compressed .npz files named by grid_key,
+    so they are shared across sessions and survive server restarts.
+    '''
+    fixed = dict(fixed or {})
+    cache_dir = cache_dir or CACHE_DIR
+    path = os.path.join(cache_dir, grid_key(x_name, y_name, fixed, resolution) + '.npz')
+    if os.path.exists(path):
+        with np.load(path) as stored:
+            return Grid(x_name, y_name, stored['x'], stored['y'], stored['z'])
+
+    grid = compute_grid(x_name, y_name, fixed, resolution)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Written to a unique temporary file, as sessions are threads of one process,
+    # so concurrent writers never share it and readers never see a partial grid
+    fd, temporary = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez_compressed(f, x=grid.x, y=grid.y, z=grid.z)
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+    _prune(cache_dir)
+    return grid
+
+
+def _prune(cache_dir):
+    '''Removes the least recently written grids above MAX_FILES'''
+    paths = [entry.path for entry in os.scandir(cache_dir) if entry.name.endswith('.npz')]
+    if len(paths) <= MAX_FILES:
+        return
+    paths.sort(key=os.path.getmtime)
+    for path in paths[:len(paths) - MAX_FILES]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def covers(grid, x, y):
+    '''Whether the points lie inside the range of the grid'''
+    return (grid.x[0] <= x) & (x <= grid.x[-1]) & (grid.y[0] <= y) & (y <= grid.y[-1])
+
+
+def interpolate(grid, x, y):
+    '''Bilinear interpolation of the grid at arbitrary points
+
+    Points outside the range are clipped to its edge,
+    check them with covers and evaluate them exactly instead.
+    '''
+    x, y = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+    x = np.clip(x, grid.x[0], grid.x[-1])
+    y = np.clip(y, grid.y[0], grid.y[-1])
+    j = np.clip(np.searchsorted(grid.x, x, side='right') - 1, 0, len(grid.x) - 2)
+    i = np.clip(np.searchsorted(grid.y, y, side='right') - 1, 0, len(grid.y) - 2)
+    tx = (x - grid.x[j]) / (grid.x[j + 1] - grid.x[j])
+    ty = (y - grid.y[i]) / (grid.y[i + 1] - grid.y[i])
+    z = grid.z
+    return ((1 - ty) * ((1 - tx) * z[i, j] + tx * z[i, j + 1])
+            + ty * ((1 - tx) * z[i + 1, j] + tx * z[i + 1, j + 1]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--x', required=True, choices=PARAMETERS)
+    parser.add_argument('--y', required=True, choices=PARAMETERS)
+    parser.add_argument('--resolution', type=int, default=RESOLUTION)
+    for name in PARAMETERS:
+        parser.add_argument(f'--{name}', type=float, default=DEFAULTS[name])
+    args = parser.parse_args(argv)
+
+    fixed = {name: getattr(args, name) for name in PARAMETERS}
+    grid = load_grid(args.x, args.y, fixed, args.resolution)
+    print(f'{args.x} x {args.y}: {grid.z.shape} -> {grid_key(args.x, args.y, fixed, args.resolution)}.npz')
+
+
+if __name__ == '__main__':
+    main()
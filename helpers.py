@@ -1,10 +1,6 @@
+from formatting import money
 
 
 def money_to_string(amount):
-    amount = str(amount).split('.')[0]
-    value_string = ''
-    for i, char in enumerate(amount[::-1]):
-        value_string += char
-        if (i + 1) % 3 == 0 and (i + 1) < len(amount):
-            value_string += ','
-    return '\$' + value_string[::-1]
\ No newline at end of file
+    '''Whole dollars for the markdown texts, e.g. \\$1,234 or -\\$1,234, see formatting.money'''
+    return money(amount, markdown=True)
@@ -0,0 +1,176 @@
+'''Monthly cash-flow ledger of the owner's and the renter's investment accounts
+
+Both households have the same monthly housing budget. Every month each of them
+invests what its own housing costs leave of the budget, so a surplus is
+reinvested whenever it appears, during the loan as well as after it,
+and a deficit, e.g. a prepayment of the loan, is withdrawn from the account.
+The gains are taxed as they are realized by the withdrawals, at given
+realization months and at the final sale, see tax_lots.
+
+All the columns have the shape (..., months), so N scenarios are run at once
+and only the realization events are looped over, never the months.
+'''
+from typing import NamedTuple
+
+import numpy as np
+
+import tax_lots
+
+
+class Account(NamedTuple):
+    '''Monthly columns of one investment account
+
+    contributions are the cumulative deposits minus the withdrawals,
+    basis is the cost of the held tax lots, taxes the cumulative tax
+    paid at the realizations and sale_tax the tax still due at the final sale.
+    '''
+    contributions: np.ndarray
+    balance: np.ndarray
+    basis: np.ndarray
+    taxes: np.ndarray
+    sale_tax: np.ndarray
+
+    @property
+    def interest(self):
+        '''Returns of the account after the taxes paid so far'''
+        return self.balance - self.contributions
+
+    @property
+    def unrealized(self):
+        '''Gains of the held lots, taxed at the final sale'''
+        return self.balance - self.basis
+
+
+class Ledger(NamedTuple):
+    '''Budget and the accounts of both households, see run_ledger'''
+    budget: np.ndarray
+    owner: Account
+    renter: Account
+
+
+def realization_months(every_years, months):
+    '''Months at which the gains are realized every given years, none for zero
+
+    The last month is left to the final sale.
+    '''
+    if not every_years:
+        return np.zeros(0, dtype=int)
+    return np.arange(int(every_years * 12), months, int(every_years * 12))
+
+
+def account(growth, initial_value, flows, tax_rate=0.0, realize=(), allowance=0.0, method='fifo'):
+    '''Runs an investment account of monthly deposits and withdrawals
+
+    The balance follows B_k = g_k B_(k-1) + c_k, which discounted with the
+    cumulative growth G_k is one cumulative sum over the months:
+        B_k = G_k (B_0 + sum_(j<=k) c_j / G_j)
+    Every deposit is a tax lot and the gains of the withdrawals are realized
+    with the cost method, see tax_lots. At a realization all the lots are sold
+    and bought back, the tax of the realized gains since the previous one
+    is withdrawn at that month and compounds onwards as every other withdrawal.
+    The tax of the gains after the last realization is due at the final sale.
+    Both are taxed per year with the allowance and the losses carried forward.
+
+    Parameters
+    ----------
+    growth : float or array_like
+        Monthly growth factor, constant along the last axis when its length is one
+    initial_value : float or array_like
+        Balance at month zero
+    flows : array_like
+        Deposit, or withdrawal when negative, at the end of every month
+    tax_rate : float or array_like
+        Tax on the realized gains
+    realize : iterable of int
+        Months at the end of a year, counted from 1, at which the gains are realized
+    allowance : float or array_like
+        Tax-free realized gains of every year
+    method : str
+        'fifo' or 'average' cost of the sold units
+
+    Returns
+    -------
+    account : Account
+    '''
+    flows = np.asarray(flows, dtype=float)
+    months = flows.shape[-1]
+    growth = np.asarray(growth, dtype=float)
+    if growth.ndim == 0 or growth.shape[-1] == 1:
+        cumulative = np.power(growth, np.arange(1, months + 1))
+    else:
+        cumulative = np.cumprod(growth, axis=-1)
+    initial_value = np.asarray(initial_value, dtype=float)[..., None]
+    balance = cumulative * (initial_value + np.cumsum(flows / cumulative, axis=-1))
+    contributions = np.broadcast_to(initial_value + np.cumsum(flows, axis=-1), balance.shape)
+    realize = sorted(set(int(month) for month in realize if 0 < month < months))
+    if not realize and not np.any(flows < 0):
+        # Only the final sale realizes gains, a loss leaves no tax
+        gain = balance[..., -1] - contributions[..., -1]
+        sale_tax = np.multiply(tax_rate, np.maximum(gain - np.asarray(allowance), 0))
+        return Account(contributions, balance, contributions, np.broadcast_to(0.0, balance.shape), sale_tax)
+
+    flows = np.broadcast_to(flows, balance.shape)
+    cumulative = np.broadcast_to(cumulative, balance.shape)
+    basis = np.empty_like(balance)
+    taxes = np.zeros_like(balance)
+    carried_loss = 0.0
+    held = np.broadcast_to(initial_value[..., 0], balance.shape[:-1])
+    bounds = [0] + realize + [months]
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        period = slice(start, end)
+        prices = cumulative[..., period] / (cumulative[..., start - 1:start] if start else 1.0)
+        if np.any(flows[..., period] < 0):
+            period_lots = tax_lots.lots(prices, flows[..., period], held, method)
+            gains, basis[..., period] = period_lots.gains.copy(), period_lots.basis
+            value = period_lots.units[..., -1] * prices[..., -1]
+        else:
+            gains = np.zeros_like(prices)
+            basis[..., period] = held[..., None] + np.cumsum(flows[..., period], axis=-1)
+            value = balance[..., end - 1]
+        # Every lot is sold at the end of the period, at a realization or the final sale
+        gains[..., -1] += value - basis[..., end - 1]
+        tax, carried_loss = tax_lots.yearly_tax(gains, tax_rate, allowance, carried_loss)
+        tax = tax.sum(axis=-1)
+        if end == months:
+            return Account(contributions, balance, basis, taxes, tax)
+        now = end - 1
+        balance[..., now:] -= tax[..., None] * cumulative[..., now:] / cumulative[..., now:now + 1]
+        taxes[..., now:] += tax[..., None]
+        basis[..., now] = held = balance[..., now]
+
+
+def run_ledger(budget, owner_costs, renter_costs, stock_return, initial_values=(0.0, 0.0),
+               tax_rate=0.0, realize=(), allowance=0.0, method='fifo'):
+    '''Runs the owner's and the renter's accounts side by side
+
+    Parameters
+    ----------
+    budget : array_like
+        Housing budget of both households in every month
+    owner_costs, renter_costs : array_like
+        Housing costs of every month, the owner's include the prepayments
+    stock_return : float or array_like
+        Effective annual return of both accounts
+    initial_values : tuple
+        Owner's and renter's balances at month zero
+    tax_rate : float or array_like
+        Tax on the gains realized before the final sale
+    realize : iterable of int
+        Realization months, see realization_months
+    allowance : float or array_like
+        Tax-free realized gains of every year, for each household
+    method : str
+        'fifo' or 'average' cost of the sold units
+
+    Returns
+    -------
+    ledger : Ledger
+    '''
+    budget = np.asarray(budget, dtype=float)
+    growth = np.power(np.asarray(stock_return, dtype=float) + 1, 1/12)[..., None]
+    owner_initial, renter_initial = initial_values
+    return Ledger(
+        budget=budget,
+        owner=account(growth, owner_initial, budget - owner_costs, tax_rate, realize, allowance, method),
+        renter=account(growth, renter_initial, budget - renter_costs, tax_rate, realize, allowance, method),
+    )
@@ -0,0 +1,180 @@
+from typing import NamedTuple
+
+import numpy as np
+
+from finance_math import escalation, remaining_balance
+from ledger import account
+from scenarios import DEFAULTS
+
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+class MonteCarloResult(NamedTuple):
+    '''Distribution of owning and renting outcomes over the simulated paths
+
+    The bands are sampled every band_every months (month holds the month
+    numbers) and have shape (len(percentiles), len(month)).
+    '''
+    month: np.ndarray
+    percentiles: tuple
+    owner_bands: np.ndarray
+    renter_bands: np.ndarray
+    owner_final: np.ndarray
+    renter_final: np.ndarray
+
+    @property
+    def p_rent_wins(self):
+        '''Share of the paths where renting ends with more after-tax net assets'''
+        return np.mean(self.renter_final > self.owner_final)
+
+
+def draw_growth(rng, annual_return, volatility, shape, distribution='lognormal', shocks=None):
+    '''Draws monthly growth factors whose expected value matches the annual return
+
+    Parameters
+    ----------
+    rng : np.random.Generator
+        Source of randomness
+    annual_return : float
+        Expected effective annual return
+    volatility : float
+        Annual volatility, scaled to monthly by sqrt(12)
+    shape : tuple
+        (paths, months)
+    distribution : str
+        'lognormal' for log-normal factors, 'normal' for normal simple returns
+    shocks : np.ndarray, optional
+        Standard normal shocks of the given shape, drawn from rng if not given
+    '''
+    if shocks is None:
+        shocks = rng.standard_normal(shape)
+    sigma = volatility / np.sqrt(12)
+    if distribution == 'lognormal':
+        mu = np.log1p(annual_return) / 12 - sigma**2 / 2
+        return np.exp(mu + sigma * shocks)
+    if distribution == 'normal':
+        return np.power(1 + annual_return, 1/12) + sigma * shocks
+    raise ValueError(f'Unknown distribution: {distribution}')
+
+
+def draw_rates(rng, interest_rate, volatility, shape):
+    '''Draws nominal annual interest rate paths as a random walk floored at zero
+
+    The rate of the first month is the contract rate.
+    '''
+    steps = rng.standard_normal(shape) * volatility / np.sqrt(12)
+    steps[:, 0] = 0
+    return np.maximum(interest_rate + np.cumsum(steps, axis=1), 0)
+
+
+def _simulate_paths(p, rng, n_paths, stock_vol, apartment_vol, rate_vol, correlation, distribution):
+    loan_months = int(p['loan_term'] * 12)
+    total_months = int((p['loan_term'] + p['time_horizont']) * 12)
+    shape = (n_paths, total_months)
+
+    # Correlated standard normal shocks of the stock and housing processes
+    stock_shocks = rng.standard_normal(shape)
+    apartment_shocks = (correlation * stock_shocks
+                        + np.sqrt(1 - correlation**2) * rng.standard_normal(shape))
+    stock_growth = draw_growth(rng, p['stock_return'], stock_vol, shape, distribution, stock_shocks)
+    apartment_growth = draw_growth(rng, p['apartment_return'], apartment_vol, shape, distribution, apartment_shocks)
+
+    # Variable rate loan re-amortized every month over the remaining term,
+    # the balance shrinks by the share remaining_balance leaves after one payment
+    rates = draw_rates(rng, p['interest_rate'], rate_vol, (n_paths, loan_months))
+    remaining_months = loan_months - np.arange(loan_months)
+    shares = remaining_balance(1.0, remaining_months, rates, 1)
+    loan_amount = p['apartment_price'] - p['down_payment']
+    balance = loan_amount * np.cumprod(shares, axis=1)
+    previous = np.concatenate((np.full((n_paths, 1), loan_amount), balance[:, :-1]), axis=1)
+    payment = previous * (1 + rates / 12) - balance
+    fcf = payment[:, :1]
+
+    # Owner invests the freed first payment after the loan,
+    # renter invests the owner's housing costs minus the rent every month, both indexed yearly,
+    # and both invest the extra savings, see ledger
+    pad = ((0, 0), (0, total_months - loan_months))
+    owner_contributions = np.where(np.arange(total_months) >= loan_months, fcf, 0) + p['savings']
+    months = np.arange(1, total_months + 1)
+    renter_contributions = (p['apartment_condo'] * escalation(p['condo_growth'], months) + np.pad(payment, pad)
+                            + owner_contributions - p['rent'] * escalation(p['rent_growth'], months))
+
+    # The withdrawals realize the gains of the sold lots, taxed with the gains left at the final sale
+    owner = account(stock_growth, 0.0, owner_contributions, p['stock_tax'])
+    renter = account(stock_growth, p['down_payment'], renter_contributions, p['stock_tax'])
+    apartment_value = p['apartment_price'] * np.cumprod(apartment_growth, axis=1)
+    loan_balance = np.pad(balance, pad)
+
+    owner_net_assets = apartment_value + owner.balance - loan_balance
+    renter_net_assets = renter.balance
+
+    owner_final = (owner_net_assets[:, -1]
+                   - (apartment_value[:, -1] - p['apartment_price']) * p['apartment_tax']
+                   - owner.sale_tax)
+    renter_final = renter_net_assets[:, -1] - renter.sale_tax
+    return owner_net_assets, renter_net_assets, owner_final, renter_final
+
+
+def simulate_monte_carlo(params=None, n_paths=10_000, stock_vol=0.15, apartment_vol=0.05, rate_vol=0.0,
+                         correlation=0.0, distribution='lognormal', seed=None, chunk_size=None,
+                         band_every=12, percentiles=PERCENTILES):
+    '''Simulates owning and renting under stochastic returns and interest rates
+
+    Every path draws monthly stock and housing growth factors,
+    optionally correlated, and a random walk of the mortgage rate
+    that re-amortizes the remaining balance every month.
+    All paths of a chunk are evaluated as (paths, months) array operations.
+    With zero volatilities the outcome equals scenarios.evaluate_scenarios.
+
+    Parameters
+    ----------
+    params : dict or NamedTuple, optional
+        Scalar parameters from scenarios.PARAMETERS, missing ones use DEFAULTS
+    n_paths : int
+        Number of simulated paths
+    stock_vol, apartment_vol : float
+        Annual volatility of the stock and housing returns
+    rate_vol : float
+        Annual volatility of the mortgage rate random walk, zero keeps it fixed
+    correlation : float
+        Correlation between the stock and housing shocks
+    distribution : str
+        'lognormal' or 'normal', see draw_growth
+    seed : int or np.random.Generator, optional
+        Seed for reproducible paths
+    chunk_size : int, optional
+        Paths simulated at a time, the working memory is bounded to
+        chunk_size x months while only the banded samples are kept of every path
+    band_every : int
+        Sampling interval of the percentile bands in months
+    percentiles : tuple
+        Percentiles of the bands
+    '''
+    if hasattr(params, '_asdict'):
+        params = params._asdict()
+    p = {**DEFAULTS, **(params or {})}
+    rng = np.random.default_rng(seed)
+    chunk_size = chunk_size or n_paths
+    total_months = int((p['loan_term'] + p['time_horizont']) * 12)
+    sampled = np.arange(band_every - 1, total_months, band_every)
+    if len(sampled) == 0 or sampled[-1] != total_months - 1:
+        sampled = np.append(sampled, total_months - 1)
+
+    owner_samples, renter_samples, owner_final, renter_final = [], [], [], []
+    for start in range(0, n_paths, chunk_size):
+        paths = _simulate_paths(p, rng, min(chunk_size, n_paths - start),
+                                stock_vol, apartment_vol, rate_vol, correlation, distribution)
+        owner_samples.append(paths[0][:, sampled])
+        renter_samples.append(paths[1][:, sampled])
+        owner_final.append(paths[2])
+        renter_final.append(paths[3])
+
+    return MonteCarloResult(
+        month=sampled + 1,
+        percentiles=tuple(percentiles),
+        owner_bands=np.percentile(np.concatenate(owner_samples), percentiles, axis=0),
+        renter_bands=np.percentile(np.concatenate(renter_samples), percentiles, axis=0),
+        owner_final=np.concatenate(owner_final),
+        renter_final=np.concatenate(renter_final),
+    )
@@ -0,0 +1,86 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, NamedTuple
+
+
+class Stage(NamedTuple):
+    '''One step of the computation
+
+    The stage function is called with its parameters and
+    the outputs of its upstream stages as keyword arguments.
+    '''
+    name: str
+    func: Callable
+    params: tuple = ()
+    inputs: tuple = ()
+
+
+class Pipeline:
+    '''Small dependency graph that reruns only the stages whose inputs changed
+
+    Every stage caches its outputs keyed by the values of its own parameters
+    and the keys of its upstream stages, so a change in one parameter
+    invalidates only the stages that depend on it, directly or transitively.
+    The cache of each stage is bounded with LRU eviction.
+    The graph is shared by all sessions of the server, hence the lock.
+
+    Parameters
+    ----------
+    stages : list of Stage
+        Stages in topological order, upstream stages first
+    cache_size : int
+        Number of cached outputs per stage
+    '''
+
+    def __init__(self, stages, cache_size=64):
+        names = set()
+        for stage in stages:
+            missing = set(stage.inputs) - names
+            if missing:
+                raise ValueError(f'Stage {stage.name} depends on unknown stages {sorted(missing)}')
+            names.add(stage.name)
+        self.stages = list(stages)
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        '''Drops all cached outputs and resets the counters'''
+        self._cache = {stage.name: OrderedDict() for stage in self.stages}
+        self._stats = {stage.name: {'hits': 0, 'misses': 0} for stage in self.stages}
+
+    def stats(self):
+        '''Returns per-stage hit and miss counters'''
+        with self._lock:
+            return {name: dict(counters) for name, counters in self._stats.items()}
+
+    def run(self, params):
+        '''Computes all stages for a parameter mapping or NamedTuple
+
+        Returns
+        -------
+        outputs : dict
+            Output of every stage by name
+        '''
+        if hasattr(params, '_asdict'):
+            # Read as attributes, so a NamedTuple can also derive parameters with properties
+            params = {name: getattr(params, name) for stage in self.stages for name in stage.params}
+        keys, outputs = {}, {}
+        with self._lock:
+            for stage in self.stages:
+                key = (tuple(params[name] for name in stage.params),
+                       tuple(keys[name] for name in stage.inputs))
+                cache = self._cache[stage.name]
+                if key in cache:
+                    cache.move_to_end(key)
+                    self._stats[stage.name]['hits'] += 1
+                else:
+                    kwargs = {name: params[name] for name in stage.params}
+                    kwargs.update((name, outputs[name]) for name in stage.inputs)
+                    cache[key] = stage.func(**kwargs)
+                    self._stats[stage.name]['misses'] += 1
+                    if len(cache) > self.cache_size:
+                        cache.popitem(last=False)
+                keys[stage.name] = key
+                outputs[stage.name] = cache[key]
+        return outputs
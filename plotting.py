@@ -1,14 +1,25 @@
+import os
+
 import plotly.graph_objects as go
 import streamlit as st
 import numpy as np
 import pandas as pd
 
+from formatting import money_array
+from heatmap import AXES
+from profiling import timed
+
+
+# Monthly series longer than MAX_POINTS are decimated before serialization,
+# DOWNSAMPLE is 'yearly', 'lttb' (Largest-Triangle-Three-Buckets) or 'none'
+MAX_POINTS = int(os.environ.get('PLOT_MAX_POINTS', 600))
+DOWNSAMPLE = os.environ.get('PLOT_DOWNSAMPLE', 'yearly')
 
 __base_layout = go.Layout(showlegend=False,
                     hovermode='x unified',
                     updatemenus=[
                                 dict(
-                                    type='buttons', 
+                                    type='buttons',
                                     showactive=False,
                                     y=1.05,
                                     x=1.15,
@@ -22,468 +33,578 @@ __base_layout = go.Layout(showlegend=False,
                     )
 
 
-def plot_balance_projection(df: pd.DataFrame):    
-    fig = go.Figure()
+def __template(yaxis_title, *traces):
+    '''Builds a validated chart template without any data
 
-    fig.add_trace(
-        go.Scatter(
-            x=df['Month'],
-            y=df['Balance'],
-            customdata=np.stack((np.ceil((df['Month']+1)/12 - 1), df['Month'], (df['Balance'] / 1000)), axis=-1),
-            mode='lines',
-            name='Loan Balance', 
-            line=dict(width=2, color='red'),
-            fill='tonexty',
-            opacity=0.8,
-            hovertemplate =
-                '<b>Years:</b> %{customdata[0]}<br>'+
-                '<b>Months:</b> %{customdata[1]}<br>'+
-                '<b>Balance:</b> $%{customdata[2]:.0f}k' +
-                '<extra></extra>'
-            ))
-    
-    layout = __base_layout
-    layout.update(
-        yaxis_title='Loan Balance',
+    The template is a plain dict built once at import time
+    and never mutated, a render only injects the data arrays
+    into shallow copies of its traces and layout.
+    '''
+    fig = go.Figure(data=traces, layout=__base_layout)
+    fig.update_layout(
+        yaxis_title=yaxis_title,
         xaxis_title='Years',
-        xaxis = dict(
-            tickmode = 'array',
-            tickvals = [int(12 * i) for i in range(df['Year'].max())],
-            ticktext = [i for i in range(df['Year'].max())]
-            )
+        xaxis_tickmode='array',
         )
-    fig.update_layout(layout)
-    st.plotly_chart(fig, use_container_width=True)
+    return fig.to_dict()
 
 
-def plot_apartment_return(df):
-    fig = go.Figure()
+def lttb(y, n_out):
+    '''Selects n_out indices of y with Largest-Triangle-Three-Buckets
 
-    y = np.full(len(df), df['Apartment'][0])
-    fig.add_trace(
-        go.Scatter(
-            x=df['Month'],
-            y=y,
-            customdata=np.stack((np.ceil((df['Month']+1)/12 - 1), df['Month'], (y / 1000)), axis=-1),
-            mode='lines',
-            name='Loan Balance', 
-            line=dict(width=2, color='green'),
-            fill='tozeroy',
-            opacity=0.8,
-            hovertemplate =
-                '<b>Apartment Purchase Price:</b> $%{customdata[2]:.0f}k' +
-                '<extra></extra>'
-            ))
-    
-    fig.add_trace(
-        go.Scatter(
-            x=df['Month'],
-            y=df['Apartment'],
-            customdata=np.stack((np.ceil((df['Month']+1)/12 - 1), df['Month'], ((df['Apartment'] - y) / 1000)), axis=-1),
-            mode='lines',
-            name='Loan Balance', 
-            line=dict(width=2, color='green'),
-            fill='tozeroy',
-            opacity=0.4,
-            hovertemplate =
-                '<b>Price Increase</b> $%{customdata[2]:.0f}k' +
-                '<extra></extra>'
-            ))
-    
-    fig.add_trace(
-        go.Scatter(
-            x=df['Month'],
-            y=df['Apartment'],
-            customdata=np.stack(df['Apartment'] / 1000, axis=-1),
-            mode='lines',
-            name='Net Assets', 
-            line=dict(width=3, color='orange'),
-            hovertemplate =
-                '<b>Curent Value:</b> $%{customdata:.0f}k' +
-                '<extra></extra>'
-            ))
-    
-    layout = __base_layout
-    layout.update(
-        yaxis_title='Apartment Value',
-        xaxis_title='Years',
-        xaxis = dict(
-            tickmode = 'array',
-            tickvals = [int(12 * i) for i in range(df['Year'].max())],
-            ticktext = [i for i in range(df['Year'].max())]
-            )
-        )
-    fig.update_layout(layout)
-    st.plotly_chart(fig, use_container_width=True)
+    The first and last points are always kept and every bucket between them
+    contributes the point forming the largest triangle with the previous
+    selected point and the mean of the next bucket,
+    which preserves the visual shape of the series.
+    '''
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_stop = edges[i + 2] if i + 2 < len(edges) else n
+        next_x, next_y = x[stop:next_stop].mean(), y[stop:next_stop].mean()
+        a = selected[i]
+        area = np.abs((x[a] - next_x) * (y[start:stop] - y[a])
+                      - (x[a] - x[start:stop]) * (next_y - y[a]))
+        selected[i + 1] = start + np.argmax(area)
+    return selected
 
 
-def plot_apartment_net_assets(df):
-    fig = go.Figure()
+def downsample_indices(df, y, max_points=None, method=None):
+    '''Selects the rows of a monthly frame that are sent to the browser
 
-    fig.add_trace(
-        go.Scatter(
-            x=df['Month'],
-            y=-df['Balance'],
-            customdata=np.stack((-df['Balance'] / 1000), axis=-1),
-            mode='lines',
-            name='Loan Balance', 
-            line=dict(width=2, color='red'),
-            fill='tozeroy',
-            opacity=0.8,
-            hovertemplate =
-                '<b>Loan Balance:</b> $%{customdata:.0f}k' +
-                '<extra></extra>'
-            ))
-    
-    y = np.full(len(df), df['Apartment'][0])
-    fig.add_trace(
-        go.Scatter(
-            x=df['Month'],
-            y=y,
-            customdata=np.stack((np.ceil((df['Month']+1)/12 - 1), df['Month'], (y / 1000)), axis=-1),
-            mode='lines',
-            name='Loan Balance', 
-            line=dict(width=2, color='green'),
-            fill='tozeroy',
-            opacity=0.8,
-            hovertemplate =
-                '<b>Purchase Price:</b> $%{customdata[2]:.0f}k' +
-                '<extra></extra>'
-            ))
-    
-    fig.add_trace(
-        go.Scatter(
-            x=df['Month'],
-            y=df['Apartment'],
-            customdata=np.stack((np.ceil((df['Month']+1)/12 - 1), df['Month'], ((df['Apartment'] - y) / 1000)), axis=-1),
-            mode='lines',
-            name='Loan Balance', 
-            line=dict(width=2, color='green'),
-            fill='tozeroy',
-            opacity=0.4,
-            hovertemplate =
-                '<b>Price Increase</b> $%{customdata[2]:.0f}k' +
-                '<extra></extra>'
-            ))
-    
-    fig.add_trace(
-        go.Scatter(
-            x=df['Month'],
-            y=df['Apartment']-df['Balance'],
-            customdata=np.stack((df['Apartment']-df['Balance']) / 1000, axis=-1),
-            mode='lines',
-            name='Net Assets', 
-            line=dict(width=3, color='orange'),
-            hovertemplate =
-                '<b>Net Assets:</b> $%{customdata:.0f}k' +
-                '<extra></extra>'
-            ))
-    
-    layout = __base_layout
-    layout.update(
-        yaxis_title='Amount [$]',
-        xaxis_title='Years',
-        xaxis = dict(
-            tickmode = 'array',
-            tickvals = [int(12 * i) for i in range(df['Year'].max())],
-            ticktext = [i for i in range(df['Year'].max())]
-            )
-        )
-    fig.update_layout(layout)
-    st.plotly_chart(fig, use_container_width=True)  
+    The selected rows are original rows, so hover values stay exact.
+    The yearly method keeps the first row, every year boundary and the last row,
+    thinning the years evenly if they alone exceed the budget, and both rows
+    around a gap in the months, e.g. the pre-sale row before the taxed last one.
+    The lttb method keeps the same year boundaries and spends
+    the rest of the budget on the shape of y.
 
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Frame with the Month column
+    y : array_like
+        Series that defines the shape for the lttb method
+    max_points : int, optional
+        Point budget per trace, defaults to MAX_POINTS
+    method : str, optional
+        'yearly', 'lttb' or 'none', defaults to DOWNSAMPLE
+    '''
+    max_points = MAX_POINTS if max_points is None else max_points
+    method = DOWNSAMPLE if method is None else method
+    month = np.asarray(df['Month'])
+    n = len(month)
+    if method == 'none' or n <= max_points:
+        return np.arange(n)
+    if method not in ('yearly', 'lttb'):
+        raise ValueError(f'Unknown downsampling method: {method}')
 
-def plot_payment(df):
-    fig = go.Figure()
+    boundaries = np.flatnonzero(month % 12 == 0)
+    step = int(np.ceil(len(boundaries) / max(max_points - 2, 1)))
+    gaps = np.flatnonzero(np.diff(month) != 1)
+    index = np.union1d(boundaries[::step], np.concatenate(([0, n - 1], gaps, gaps + 1)))
+    if method == 'lttb' and len(index) < max_points:
+        index = np.union1d(index, lttb(y, max_points - len(index)))
+    return index
 
-    fig.add_trace(
-        go.Scatter(
-            x=df['Month'],
-            y=df['Condominium'],
-            customdata=np.stack(df['Condominium'], axis=-1),
-            mode='lines',
-            line=dict(width=2, color='grey'),
-            fill='tozeroy',
-            opacity=0,
-            hovertemplate =
-                '<b>Condominium</b> $%{customdata:.0f}' +
-                '<extra></extra>'
-            ))
-
-    fig.add_trace(
-        go.Scatter(
-            x=df['Month'],
-            y=df['Condominium'] + df['Principal'],
-            customdata=np.stack(df['Principal'], axis=-1),
-            mode='lines',
-            line=dict(width=2, color='green'),
-            fill='tonexty',
-            opacity=0,
-            hovertemplate =
-                '<b>Principal</b> $%{customdata:.0f}' +
-                '<extra></extra>'
-            ))
-        
-    fig.add_trace(
-        go.Scatter(
-            x=df['Month'],
-            y=df['Condominium'] + df['Principal'] + df['Interest'],
-            customdata=np.stack(df['Interest'], axis=-1),
-            mode='lines',
-            name='Payment Principal', 
-            line=dict(width=2, color='red'),
-            fill='tonexty',
-            opacity=0.99,
-            hovertemplate =
-                '<b>Interest</b> $%{customdata:.0f}' +
-                '<extra></extra>'
-            ))
-    
-    fig.add_trace(
-        go.Scatter(
-            x=df['Month'],
-            y=df['Condominium'] + df['Principal'] + df['Interest'],
-            customdata=np.stack(df['Condominium'] + df['Principal'] + df['Interest'], axis=-1),
-            mode='lines',
-            name='Payment Principal', 
-            line=dict(width=3, color='orange'),
-            #fill='tonexty',
-            hovertemplate =
-                '<b>Total Cost</b> $%{customdata:.0f}' +
-                '<extra></extra>'
-            ))
-    
-    layout = __base_layout
-    layout.update(
-        yaxis_title='Amount [$]',
-        xaxis_title='Years',
-        xaxis = dict(
-            tickmode = 'array',
-            tickvals = [int(12 * i) for i in range(df['Year'].max())],
-            ticktext = [i for i in range(df['Year'].max())]
-            )
-        )
-    fig.update_layout(layout)
-    st.plotly_chart(fig, use_container_width=True)
 
+def __render(template, df, *traces):
+    '''Creates a figure from a template and the per-trace data
 
+    Parameters
+    ----------
+    template : dict
+        Template from __template
+    df : pd.DataFrame
+        Frame with the Month and Year columns of the x-axis
+    *traces : dict
+        Data of every template trace, e.g. y, customdata or hovertemplate.
+        The arrays are downsampled along the rows of df,
+        using the last trace for the shape. A trace with its own x,
+        the months of another frame, is downsampled by them and its own y.
+    '''
+    index = downsample_indices(df, traces[-1]['y'])
+    x = np.asarray(df['Month'])
+    years = np.arange(df['Year'].max())
+    layout = template['layout']
+    layout = {**layout, 'xaxis': {**layout['xaxis'], 'tickvals': 12 * years, 'ticktext': years}}
+    data = []
+    for trace, values in zip(template['data'], traces):
+        rows = index
+        if 'x' in values:
+            rows = downsample_indices({'Month': values['x']}, values['y'])
+        values = {'x': x, **values}
+        if len(rows) < len(values['x']):
+            values = {key: value[rows] if isinstance(value, np.ndarray) else value
+                      for key, value in values.items()}
+        data.append({**trace, **values})
+    # The template is already validated and the data arrays are plain numeric arrays
+    return go.Figure({'data': data, 'layout': layout}, _validate=False)
 
-def plot_renting_net_assets(df):
-    fig = go.Figure()
 
-    fig.add_trace(
-        go.Scatter(
-            x=df['Month'],
-            y=df['Contributions'],
-            customdata=np.stack(df['Contributions']/1000, axis=-1),
-            mode='lines',
-            line=dict(width=2, color='green'),
-            fill='tozeroy',
-            opacity=0.8,
-            hovertemplate =
-                '<b>Contributions</b> $%{customdata:.0f}k' +
-                '<extra></extra>'
-            ))
-    
-    fig.add_trace(
-        go.Scatter(
-            x=df['Month'],
-            y=df['Contributions'] + df['Interest'],
-            customdata=np.stack(df['Interest']/1000, axis=-1),
-            mode='lines',
-            line=dict(width=2, color='green'),
-            fill='tozeroy',
-            opacity=0.4,
-            hovertemplate =
-                '<b>Interest</b> $%{customdata:.0f}k' +
-                '<extra></extra>'
-            ))
-    
-    fig.add_trace(
-        go.Scatter(
-            x=df['Month'],
-            y=df['NetAssets'],
-            customdata=np.stack(df['NetAssets']/1000, axis=-1),
-            mode='lines',
-            line=dict(width=3, color='orange'),
-            #fill='tozeroy',
-            opacity=1.0,
-            hovertemplate =
-                '<b>Net Assets</b> $%{customdata:.0f}k' +
-                '<extra></extra>'
-            ))
-    
-    layout = __base_layout
-    layout.update(
-        yaxis_title='Amount [$]',
-        xaxis_title='Years',
-        xaxis = dict(
-            tickmode = 'array',
-            tickvals = [int(12 * i) for i in range(df['Year'].max())],
-            ticktext = [i for i in range(df['Year'].max())]
-            )
-        )
-    fig.update_layout(layout)
-    st.plotly_chart(fig, use_container_width=True)
+def __thousands(values):
+    return np.asarray(values) / 1000
 
 
-def plot_apartment_net_assets_with_investing(df):
-    fig = go.Figure()
+def __stacked(df, *names):
+    '''Cumulative sums of the columns for stacked traces'''
+    if hasattr(df, 'stacked'):
+        return df.stacked(*names)
+    return np.cumsum([np.asarray(df[name], dtype=float) for name in names], axis=0)
 
-    fig.add_trace(
-        go.Scatter(
-            x=df['Month'],
-            y=-df['Balance'],
-            customdata=np.stack((-df['Balance'] / 1000), axis=-1),
-            mode='lines',
-            name='Loan Balance', 
-            line=dict(width=2, color='red'),
-            fill='tozeroy',
-            opacity=0.8,
-            hovertemplate =
-                '<b>Loan Balance:</b> $%{customdata:.0f}k' +
-                '<extra></extra>'
-            ))
-    
-    fig.add_trace(
-        go.Scatter(
-            x=df['Month'],
-            y=df['Apartment'],
-            customdata=np.stack(df['Apartment'] / 1000, axis=-1),
-            mode='lines',
-            name='Loan Balance', 
-            line=dict(width=2, color='rgb(24,135,45)'),
-            fill='tozeroy',
-            opacity=0.8,
-            hovertemplate =
-                '<b>Purchase Price:</b> $%{customdata:.0f}k' +
-                '<extra></extra>'
-            ))
-    
-    fig.add_trace(
-        go.Scatter(
-            x=df['Month'],
-            y=df['Apartment'] + df['ApartmentGain'],
-            customdata=np.stack((df['ApartmentGain']) / 1000, axis=-1),
-            mode='lines',
-            line=dict(width=2, color='rgb(24,135,45)'),
-            fill='tozeroy',
-            opacity=0.4,
-            hovertemplate =
-                '<b>Price Increase</b> $%{customdata:.0f}k' +
-                '<extra></extra>'
-            ))
-    
-    fig.add_trace(
-        go.Scatter(
-            x=df['Month'],
-            y=df['Apartment'] + df['ApartmentGain'] + df['Contributions'],
-            customdata=np.stack(df['Contributions'] / 1000, axis=-1),
-            mode='lines',
-            line=dict(width=2, color='rgb(255,180,0)'),
-            fill='tonexty',
-            opacity=0.4,
-            hovertemplate =
-                '<b>Investment Contributions</b> $%{customdata:.0f}k' +
-                '<extra></extra>'
-            ))
-    
-    fig.add_trace(
-        go.Scatter(
-            x=df['Month'],
-            y=df['Apartment'] + df['ApartmentGain'] + df['Contributions'] + df['Interest'],
-            customdata=np.stack(df['Interest'] / 1000, axis=-1),
-            mode='lines',
-            line=dict(width=2, color='rgb(255,215,0)'),
-            fill='tonexty',
-            opacity=0.4,
-            hovertemplate =
-                '<b>Investment Gains</b> $%{customdata:.0f}k' +
-                '<extra></extra>'
-            ))
-    
-    fig.add_trace(
+
+def __hover_years(df, y):
+    month = np.asarray(df['Month'])
+    return np.stack((np.ceil((month + 1)/12 - 1), month, __thousands(y)), axis=-1)
+
+
+__balance_projection = __template(
+    'Loan Balance',
+    go.Scatter(
+        mode='lines',
+        name='Loan Balance',
+        line=dict(width=2, color='red'),
+        fill='tonexty',
+        opacity=0.8,
+        hovertemplate =
+            '<b>Years:</b> %{customdata[0]}<br>'+
+            '<b>Months:</b> %{customdata[1]}<br>'+
+            '<b>Balance:</b> $%{customdata[2]:.0f}k' +
+            '<extra></extra>'
+        ))
+
+__apartment_return = __template(
+    'Apartment Value',
+    go.Scatter(
+        mode='lines',
+        name='Loan Balance',
+        line=dict(width=2, color='green'),
+        fill='tozeroy',
+        opacity=0.8,
+        hovertemplate =
+            '<b>Apartment Purchase Price:</b> $%{customdata[2]:.0f}k' +
+            '<extra></extra>'
+        ),
+    go.Scatter(
+        mode='lines',
+        name='Loan Balance',
+        line=dict(width=2, color='green'),
+        fill='tozeroy',
+        opacity=0.4,
+        hovertemplate =
+            '<b>Price Increase</b> $%{customdata[2]:.0f}k' +
+            '<extra></extra>'
+        ),
+    go.Scatter(
+        mode='lines',
+        name='Net Assets',
+        line=dict(width=3, color='orange'),
+        hovertemplate =
+            '<b>Curent Value:</b> $%{customdata:.0f}k' +
+            '<extra></extra>'
+        ))
+
+__apartment_net_assets = __template(
+    'Amount [$]',
+    go.Scatter(
+        mode='lines',
+        name='Loan Balance',
+        line=dict(width=2, color='red'),
+        fill='tozeroy',
+        opacity=0.8,
+        hovertemplate =
+            '<b>Loan Balance:</b> $%{customdata:.0f}k' +
+            '<extra></extra>'
+        ),
+    go.Scatter(
+        mode='lines',
+        name='Loan Balance',
+        line=dict(width=2, color='green'),
+        fill='tozeroy',
+        opacity=0.8,
+        hovertemplate =
+            '<b>Purchase Price:</b> $%{customdata[2]:.0f}k' +
+            '<extra></extra>'
+        ),
+    go.Scatter(
+        mode='lines',
+        name='Loan Balance',
+        line=dict(width=2, color='green'),
+        fill='tozeroy',
+        opacity=0.4,
+        hovertemplate =
+            '<b>Price Increase</b> $%{customdata[2]:.0f}k' +
+            '<extra></extra>'
+        ),
+    go.Scatter(
+        mode='lines',
+        name='Net Assets',
+        line=dict(width=3, color='orange'),
+        hovertemplate =
+            '<b>Net Assets:</b> $%{customdata:.0f}k' +
+            '<extra></extra>'
+        ))
+
+__payment = __template(
+    'Amount [$]',
+    go.Scatter(
+        mode='lines',
+        line=dict(width=2, color='grey'),
+        fill='tozeroy',
+        opacity=0,
+        hovertemplate =
+            '<b>Condominium</b> $%{customdata:.0f}' +
+            '<extra></extra>'
+        ),
+    go.Scatter(
+        mode='lines',
+        line=dict(width=2, color='green'),
+        fill='tonexty',
+        opacity=0,
+        hovertemplate =
+            '<b>Principal</b> $%{customdata:.0f}' +
+            '<extra></extra>'
+        ),
+    go.Scatter(
+        mode='lines',
+        name='Payment Principal',
+        line=dict(width=2, color='red'),
+        fill='tonexty',
+        opacity=0.99,
+        hovertemplate =
+            '<b>Interest</b> $%{customdata:.0f}' +
+            '<extra></extra>'
+        ),
+    go.Scatter(
+        mode='lines',
+        name='Payment Principal',
+        line=dict(width=3, color='orange'),
+        hovertemplate =
+            '<b>Total Cost</b> $%{customdata:.0f}' +
+            '<extra></extra>'
+        ))
+
+__renting_net_assets = __template(
+    'Amount [$]',
+    go.Scatter(
+        mode='lines',
+        line=dict(width=2, color='green'),
+        fill='tozeroy',
+        opacity=0.8,
+        hovertemplate =
+            '<b>Contributions</b> $%{customdata:.0f}k' +
+            '<extra></extra>'
+        ),
+    go.Scatter(
+        mode='lines',
+        line=dict(width=2, color='green'),
+        fill='tozeroy',
+        opacity=0.4,
+        hovertemplate =
+            '<b>Interest</b> $%{customdata:.0f}k' +
+            '<extra></extra>'
+        ),
+    go.Scatter(
+        mode='lines',
+        line=dict(width=3, color='orange'),
+        opacity=1.0,
+        hovertemplate =
+            '<b>Net Assets</b> $%{customdata:.0f}k' +
+            '<extra></extra>'
+        ))
+
+__apartment_net_assets_with_investing = __template(
+    'Amount [$]',
+    go.Scatter(
+        mode='lines',
+        name='Loan Balance',
+        line=dict(width=2, color='red'),
+        fill='tozeroy',
+        opacity=0.8,
+        hovertemplate =
+            '<b>Loan Balance:</b> $%{customdata:.0f}k' +
+            '<extra></extra>'
+        ),
+    go.Scatter(
+        mode='lines',
+        name='Loan Balance',
+        line=dict(width=2, color='rgb(24,135,45)'),
+        fill='tozeroy',
+        opacity=0.8,
+        hovertemplate =
+            '<b>Purchase Price:</b> $%{customdata:.0f}k' +
+            '<extra></extra>'
+        ),
+    go.Scatter(
+        mode='lines',
+        line=dict(width=2, color='rgb(24,135,45)'),
+        fill='tozeroy',
+        opacity=0.4,
+        hovertemplate =
+            '<b>Price Increase</b> $%{customdata:.0f}k' +
+            '<extra></extra>'
+        ),
+    go.Scatter(
+        mode='lines',
+        line=dict(width=2, color='rgb(255,180,0)'),
+        fill='tonexty',
+        opacity=0.4,
+        hovertemplate =
+            '<b>Investment Contributions</b> $%{customdata:.0f}k' +
+            '<extra></extra>'
+        ),
+    go.Scatter(
+        mode='lines',
+        line=dict(width=2, color='rgb(255,215,0)'),
+        fill='tonexty',
+        opacity=0.4,
+        hovertemplate =
+            '<b>Investment Gains</b> $%{customdata:.0f}k' +
+            '<extra></extra>'
+        ),
+    go.Scatter(
+        mode='lines',
+        name='Net Assets',
+        line=dict(width=3, color='orange'),
+        hovertemplate =
+            '<b>Net Assets:</b> $%{customdata:.0f}k' +
+            '<extra></extra>'
+        ))
+
+# Loser first with a dashed line, the winner is drawn on top of it
+__summary = __template(
+    'Amount [$]',
+    go.Scatter(
+        mode='lines',
+        fill='tozeroy',
+        fillcolor='rgba(255,50,30,0.4)',
+        line=dict(width=2, color='rgba(255,50,30,0.4)', dash='dash'),
+        ),
+    go.Scatter(
+        mode='lines',
+        fill='tozeroy',
+        fillcolor='rgba(5,110,10,0.7)',
+        line=dict(width=3, color='rgba(5,110,10,0.7)'),
+        ))
+
+
+__heatmap = go.Figure(
+    data=[
+        go.Heatmap(
+            colorscale='RdYlGn',
+            zmid=0,
+            colorbar=dict(title='Own - Rent'),
+            ),
         go.Scatter(
-            x=df['Month'],
-            y=df['NetAssets'],
-            customdata=np.stack((df['NetAssets']) / 1000, axis=-1),
-            mode='lines',
-            name='Net Assets', 
-            line=dict(width=3, color='orange'),
-            hovertemplate =
-                '<b>Net Assets:</b> $%{customdata:.0f}k' +
-                '<extra></extra>'
-            ))
-    
-    layout = __base_layout
-    layout.update(
-        yaxis_title='Amount [$]',
-        xaxis_title='Years',
-        xaxis = dict(
-            tickmode = 'array',
-            tickvals = [int(12 * i) for i in range(df['Year'].max())],
-            ticktext = [i for i in range(df['Year'].max())]
-            )
-        )
-    fig.update_layout(layout)
-    st.plotly_chart(fig, use_container_width=True)  
+            mode='markers',
+            marker=dict(size=12, color='black', symbol='x'),
+            hovertemplate='<b>Your inputs</b><extra></extra>',
+            ),
+        ],
+    layout=go.Layout(showlegend=False),
+    ).to_dict()
+
+
+def figure_heatmap(grid, marker=None):
+    '''Heatmap of owning minus renting net assets of a heatmap.Grid
+
+    Parameters
+    ----------
+    grid : heatmap.Grid
+        Precomputed grid
+    marker : tuple, optional
+        (x, y) of the current inputs
+    '''
+    (_, x_label, x_scale), (_, y_label, y_scale) = AXES[grid.x_name], AXES[grid.y_name]
+    data = [{
+        **__heatmap['data'][0],
+        'x': grid.x * x_scale,
+        'y': grid.y * y_scale,
+        'z': grid.z / 1000,
+        'hovertemplate':
+            f'{x_label}: %{{x:.4~g}}<br>{y_label}: %{{y:.4~g}}<br>' +
+            '<b>Own - Rent:</b> $%{z:.0f}k' +
+            '<extra></extra>',
+        }]
+    if marker is not None:
+        data.append({**__heatmap['data'][1], 'x': [marker[0] * x_scale], 'y': [marker[1] * y_scale]})
+    layout = {**__heatmap['layout'],
+              'xaxis': {'title': {'text': x_label}},
+              'yaxis': {'title': {'text': y_label}}}
+    return go.Figure({'data': data, 'layout': layout}, _validate=False)
+
+
+# Lower inputs in red and higher ones in green, the bars start from the difference at the inputs
+__tornado = go.Figure(
+    data=[
+        go.Bar(
+            orientation='h',
+            name='Lower input',
+            marker=dict(color='rgba(255,50,30,0.7)'),
+            hovertemplate='<b>Lower:</b> %{customdata[0]}<br><b>Own - Rent:</b> %{customdata[1]}<extra></extra>',
+            ),
+        go.Bar(
+            orientation='h',
+            name='Higher input',
+            marker=dict(color='rgba(5,110,10,0.7)'),
+            hovertemplate='<b>Higher:</b> %{customdata[0]}<br><b>Own - Rent:</b> %{customdata[1]}<extra></extra>',
+            ),
+        ],
+    layout=go.Layout(barmode='overlay',
+                     legend=dict(orientation='h', y=-0.15),
+                     xaxis=dict(title='Own - Rent [$k]'),
+                     yaxis=dict(autorange='reversed')),
+    ).to_dict()
+
+
+def figure_tornado(sensitivity):
+    '''Tornado chart of a sensitivity.Sensitivity, the largest swing on top
+
+    The few hover labels are formatted as text with formatting.money_array.
+    The long monthly series keep plotly's number formats instead,
+    as text labels would multiply the size and serialization time of their figures.
+    '''
+    order = sensitivity.ranked()
+    names = [sensitivity.names[i] for i in order]
+    scales = np.array([AXES[name][2] for name in names])
+    base = sensitivity.base / 1000
+    data = []
+    for trace, values, difference in zip(__tornado['data'], (sensitivity.low, sensitivity.high),
+                                         (sensitivity.down, sensitivity.up)):
+        labels = money_array(difference[order], compact=True)
+        data.append({**trace,
+                     'y': [AXES[name][1] for name in names],
+                     'x': __thousands(difference[order]) - base,
+                     'base': base,
+                     'customdata': np.column_stack((np.char.mod('%.4g', values[order] * scales), labels))})
+    layout = {**__tornado['layout'],
+              'shapes': [dict(type='line', x0=base, x1=base, y0=0, y1=1, yref='paper',
+                              line=dict(color='black', width=1))]}
+    return go.Figure({'data': data, 'layout': layout}, _validate=False)
+
+
+def figure_balance_projection(df: pd.DataFrame):
+    return __render(__balance_projection, df,
+                    dict(y=np.asarray(df['Balance']), customdata=__hover_years(df, df['Balance'])))
+
+
+def figure_apartment_return(df):
+    apartment = np.asarray(df['Apartment'])
+    y = np.full(len(df), apartment[0])
+    return __render(__apartment_return, df,
+                    dict(y=y, customdata=__hover_years(df, y)),
+                    dict(y=apartment, customdata=__hover_years(df, apartment - y)),
+                    dict(y=apartment, customdata=__thousands(apartment)))
+
+
+def figure_apartment_net_assets(df):
+    apartment = np.asarray(df['Apartment'])
+    balance = np.asarray(df['Balance'])
+    y = np.full(len(df), apartment[0])
+    return __render(__apartment_net_assets, df,
+                    dict(y=-balance, customdata=__thousands(-balance)),
+                    dict(y=y, customdata=__hover_years(df, y)),
+                    dict(y=apartment, customdata=__hover_years(df, apartment - y)),
+                    dict(y=apartment - balance, customdata=__thousands(apartment - balance)))
+
+
+def figure_payment(df):
+    condominium, principal, interest = __stacked(df, 'Condominium', 'Principal', 'Interest')
+    return __render(__payment, df,
+                    dict(y=condominium, customdata=condominium),
+                    dict(y=principal, customdata=np.asarray(df['Principal'])),
+                    dict(y=interest, customdata=np.asarray(df['Interest'])),
+                    dict(y=interest, customdata=interest))
+
+
+def figure_renting_net_assets(df):
+    contributions = np.asarray(df['Contributions'])
+    interest = np.asarray(df['Interest'])
+    net_assets = np.asarray(df['NetAssets'])
+    return __render(__renting_net_assets, df,
+                    dict(y=contributions, customdata=__thousands(contributions)),
+                    dict(y=contributions + interest, customdata=__thousands(interest)),
+                    dict(y=net_assets, customdata=__thousands(net_assets)))
+
+
+def figure_apartment_net_assets_with_investing(df):
+    balance = np.asarray(df['Balance'])
+    apartment = np.asarray(df['Apartment'])
+    gain = np.asarray(df['ApartmentGain'])
+    contributions = np.asarray(df['Contributions'])
+    interest = np.asarray(df['Interest'])
+    net_assets = np.asarray(df['NetAssets'])
+    return __render(__apartment_net_assets_with_investing, df,
+                    dict(y=-balance, customdata=__thousands(-balance)),
+                    dict(y=apartment, customdata=__thousands(apartment)),
+                    dict(y=apartment + gain, customdata=__thousands(gain)),
+                    dict(y=apartment + gain + contributions, customdata=__thousands(contributions)),
+                    dict(y=apartment + gain + contributions + interest, customdata=__thousands(interest)),
+                    dict(y=net_assets, customdata=__thousands(net_assets)))
+
+
+def figure_summary(df, df_invest):
+    def trace(frame, label):
+        y = np.asarray(frame['NetAssets'])
+        return dict(x=np.asarray(frame['Month']),
+                    y=y,
+                    customdata=__thousands(y),
+                    hovertemplate=f'<b>{label}</b> $%{{customdata:.0f}}k' + '<extra></extra>')
 
+    owning = trace(df, 'Owning NetAsset')
+    investing = trace(df_invest, 'Investing NetAsset')
+    if np.asarray(df['NetAssets'])[-1] > np.asarray(df_invest['NetAssets'])[-1]:
+        return __render(__summary, df, investing, owning)
+    return __render(__summary, df, owning, investing)
 
+
+@timed
+def plot_balance_projection(df: pd.DataFrame):
+    st.plotly_chart(figure_balance_projection(df), use_container_width=True)
+
+
+@timed
+def plot_apartment_return(df):
+    st.plotly_chart(figure_apartment_return(df), use_container_width=True)
+
+
+@timed
+def plot_apartment_net_assets(df):
+    st.plotly_chart(figure_apartment_net_assets(df), use_container_width=True)
+
+
+@timed
+def plot_payment(df):
+    st.plotly_chart(figure_payment(df), use_container_width=True)
+
+
+@timed
+def plot_renting_net_assets(df):
+    st.plotly_chart(figure_renting_net_assets(df), use_container_width=True)
+
+
+@timed
+def plot_apartment_net_assets_with_investing(df):
+    st.plotly_chart(figure_apartment_net_assets_with_investing(df), use_container_width=True)
+
+
+@timed
 def plot_summary(df, df_invest):
-    def add_trace(x, y, color, edge, ls, lw, label):
-        fig.add_trace(
-            go.Scatter(
-                x=x,
-                y=y,
-                customdata=np.stack((y / 1000), axis=-1),
-                mode='lines',
-                fill=edge,
-                fillcolor=color,
-                line=dict(width=lw, color=color, dash=ls),
-                hovertemplate =
-                    f'<b>{label}</b> $%{{customdata:.0f}}k' +
-                    '<extra></extra>'
-                ))
-
-    fig = go.Figure()
-
-    """ if df['NetAssets'].iloc[-1] > df_invest['NetAssets'].iloc[-1]:
-        if df['NetAssets'].max() > df_invest['NetAssets'].max():
-            add_trace(df_invest['Month'], df_invest['NetAssets'], 'red', 'tozeroy', 'Investing NetAsset')
-            add_trace(df['Month'], df['NetAssets'], 'green', 'tonexty', 'Owning NetAsset')
-        else:
-            add_trace(df_invest['Month'], df_invest['NetAssets'], 'red', 'tozeroy', 'Investing NetAsset')
-            add_trace(df['Month'], df['NetAssets'], 'green', 'tonexty', 'Owning NetAsset')
-            #add_trace(df['Month'], df['NetAssets'], 'green', 'tozeroy', 'Owning NetAsset') 
-            #add_trace(df_invest['Month'], df_invest['NetAssets'], 'red', 'tonexty', 'Investing NetAsset')       
-    else:
-        if df['NetAssets'].max() < df_invest['NetAssets'].max():
-            add_trace(df['Month'], df['NetAssets'], 'red', 'tozeroy', 'Owning NetAsset')
-            add_trace(df_invest['Month'], df_invest['NetAssets'], 'green', 'tonexty', 'Investing NetAsset')
-        else:
-            add_trace(df_invest['Month'], df_invest['NetAssets'], 'green', 'tozeroy', 'Investing NetAsset') 
-            add_trace(df['Month'], df['NetAssets'], 'red', 'tonexty', 'Owning NetAsset') """
-
-    if df['NetAssets'].iloc[-1] > df_invest['NetAssets'].iloc[-1]:
-        add_trace(df_invest['Month'], df_invest['NetAssets'], 'rgba(255,50,30,0.4)', 'tozeroy', 'dash', 2, 'Investing NetAsset')
-        add_trace(df['Month'], df['NetAssets'], 'rgba(5,110,10,0.7)', 'tozeroy', None, 3, 'Owning NetAsset')
-       
-    else:
-        add_trace(df['Month'], df['NetAssets'], 'rgba(255,50,30,0.4)', 'tozeroy', 'dash', 2, 'Owning NetAsset')
-        add_trace(df_invest['Month'], df_invest['NetAssets'], 'rgba(5,110,10,0.7)', 'tozeroy', None, 3, 'Investing NetAsset')
-
-
-    
-    layout = __base_layout
-    layout.update(
-        yaxis_title='Amount [$]',
-        xaxis_title='Years',
-        xaxis = dict(
-            tickmode = 'array',
-            tickvals = [int(12 * i) for i in range(df['Year'].max())],
-            ticktext = [i for i in range(df['Year'].max())]
-            )
-        )
-    fig.update_layout(layout)
-    st.plotly_chart(fig, use_container_width=True)  
+    st.plotly_chart(figure_summary(df, df_invest), use_container_width=True)
+
+
+@timed
+def plot_tornado(sensitivity):
+    st.plotly_chart(figure_tornado(sensitivity), use_container_width=True)
+
 
+@timed
+def plot_heatmap(grid, marker=None):
+    st.plotly_chart(figure_heatmap(grid, marker), use_container_width=True)
@@ -0,0 +1,175 @@
+'''Per-stage latency histograms of the hot paths
+
+Functions decorated with @timed record their wall time into histograms
+shared by all sessions of the server process. Recording is off unless
+the PROFILING environment variable is set, or a rerun enables it for its
+own thread with enable(), e.g. from the ?profile=1 query parameter,
+and a disabled call only adds an attribute lookup.
+
+    PROFILING=1 PROFILING_EXPORT=metrics.prom streamlit run app.py
+'''
+import functools
+import math
+import os
+import tempfile
+import threading
+import time
+
+
+ENABLED = os.environ.get('PROFILING', '') not in ('', '0')
+EXPORT_PATH = os.environ.get('PROFILING_EXPORT')
+
+# Upper bounds of the histogram buckets in seconds, the last bucket is +Inf
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_local = threading.local()
+_lock = threading.Lock()
+
+
+class Histogram:
+    '''Per-bucket sample counts with the sum, count and maximum of the samples'''
+    __slots__ = ('counts', 'sum', 'count', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, seconds):
+        index = next((i for i, bound in enumerate(BUCKETS) if seconds <= bound), len(BUCKETS))
+        self.counts[index] += 1
+        self.sum += seconds
+        self.count += 1
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        '''Upper bound of the bucket holding the q-quantile, as Prometheus estimates it'''
+        rank = q * self.count
+        total = 0
+        for bound, count in zip(BUCKETS + (math.inf,), self.counts):
+            total += count
+            if total >= rank and count:
+                return min(bound, self.max)
+        return self.max
+
+
+HISTOGRAMS = {}
+
+
+def enable(enabled=True):
+    '''Enables or disables recording for the current thread (one session rerun)'''
+    _local.enabled = enabled
+
+
+def enabled():
+    return getattr(_local, 'enabled', ENABLED)
+
+
+def record(name, seconds):
+    '''Adds one sample to the histogram of the named stage'''
+    with _lock:
+        histogram = HISTOGRAMS.get(name)
+        if histogram is None:
+            histogram = HISTOGRAMS[name] = Histogram()
+        histogram.add(seconds)
+
+
+def timed(func=None, *, name=None):
+    '''Decorator recording the wall time of every call when profiling is enabled
+
+    The stage is named module.function unless a name is given.
+    '''
+    if func is None:
+        return functools.partial(timed, name=name)
+    name = name or f'{func.__module__}.{func.__qualname__}'
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not getattr(_local, 'enabled', ENABLED):
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            record(name, time.perf_counter() - start)
+
+    return wrapper
+
+
+def snapshot():
+    '''Copy of the histograms safe to read while other sessions record'''
+    with _lock:
+        copies = {}
+        for name, histogram in HISTOGRAMS.items():
+            copy = copies[name] = Histogram()
+            copy.counts, copy.sum, copy.count, copy.max = list(histogram.counts), histogram.sum, histogram.count, histogram.max
+        return copies
+
+
+def reset():
+    with _lock:
+        HISTOGRAMS.clear()
+
+
+def summary():
+    '''Count and milliseconds (mean, p50, p95, max) per stage, slowest total first'''
+    rows = [{'stage': name,
+             'calls': histogram.count,
+             'total_ms': histogram.sum * 1000,
+             'mean_ms': histogram.sum / histogram.count * 1000,
+             'p50_ms': histogram.quantile(0.5) * 1000,
+             'p95_ms': histogram.quantile(0.95) * 1000,
+             'max_ms': histogram.max * 1000}
+            for name, histogram in snapshot().items() if histogram.count]
+    return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+
+
+def prometheus_text(metric='stage_duration_seconds'):
+    '''The histograms in the Prometheus text exposition format'''
+    lines = [f'# HELP {metric} Wall time of the instrumented stages.', f'# TYPE {metric} histogram']
+    for name, histogram in sorted(snapshot().items()):
+        cumulative = 0
+        for bound, count in zip(BUCKETS + (math.inf,), histogram.counts):
+            cumulative += count
+            le = '+Inf' if bound == math.inf else repr(bound)
+            lines.append(f'{metric}_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+        lines.append(f'{metric}_sum{{stage="{name}"}} {histogram.sum!r}')
+        lines.append(f'{metric}_count{{stage="{name}"}} {histogram.count}')
+    return '\n'.join(lines) + '\n'
+
+
+def export(path=None):
+    '''Writes prometheus_text() to a local file, e.g. for the node_exporter textfile collector'''
+    path = path or EXPORT_PATH
+    # A unique temporary file, the sessions exporting at once are threads of one process
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(prometheus_text())
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+    return path
+
+
+def debug_panel():
+    '''Collapsible sidebar panel with the per-stage latencies of all sessions'''
+    import pandas as pd
+    import streamlit as st
+
+    with st.sidebar.expander('Debug: stage timings', expanded=False):
+        rows = summary()
+        if not rows:
+            st.caption('No samples recorded yet.')
+            return
+        st.dataframe(pd.DataFrame(rows).set_index('stage').round(2), use_container_width=True)
+        stage = st.selectbox('Histogram of', [row['stage'] for row in rows], key='profiling_stage')
+        histogram = snapshot()[stage]
+        # Numbered so the chart keeps the bucket order
+        labels = [f'{i:02d}: <= {bound * 1000:g} ms' for i, bound in enumerate(BUCKETS)] + [f'{len(BUCKETS)}: > 10 s']
+        st.bar_chart(pd.DataFrame({'calls': histogram.counts}, index=pd.Index(labels, name='duration')))
+        if EXPORT_PATH:
+            st.caption(f'Exported to {export()}')
+        st.download_button('Prometheus metrics', prometheus_text(), file_name='metrics.prom', mime='text/plain')
@@ -0,0 +1,175 @@
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from finance_math import amortization_columns, investment_columns, remaining_balance
+
+
+# Bumped whenever the model changes, invalidates results stored on disk
+MODEL_VERSION = 5
+
+# Sidebar inputs of app.py, rates and taxes as fractions instead of percentages
+PARAMETERS = (
+    'apartment_price',
+    'down_payment',
+    'loan_term',
+    'interest_rate',
+    'apartment_condo',
+    'apartment_return',
+    'apartment_tax',
+    'rent',
+    'time_horizont',
+    'stock_return',
+    'stock_tax',
+    'rent_growth',
+    'condo_growth',
+    'savings',
+)
+
+DEFAULTS = {
+    'apartment_price': 175_000,
+    'down_payment': 17_500,
+    'loan_term': 25,
+    'interest_rate': 0.045,
+    'apartment_condo': 220,
+    'apartment_return': 0.005,
+    'apartment_tax': 0.0,
+    'rent': 850,
+    'time_horizont': 5,
+    'stock_return': 0.07,
+    'stock_tax': 0.30,
+    'rent_growth': 0.0,
+    'condo_growth': 0.0,
+    'savings': 0.0,
+}
+
+
+class ScenarioResult(NamedTuple):
+    '''Owning and renting outcomes of N parameter sets
+
+    The monthly quantities have shape (N, months), or (N, 1) with only the
+    final month when evaluated with full=False.
+    Months past the horizon of a scenario are NaN.
+    '''
+    loan_balance: np.ndarray
+    apartment_value: np.ndarray
+    owner_investment: np.ndarray
+    renter_investment: np.ndarray
+    owner_net_assets: np.ndarray
+    renter_net_assets: np.ndarray
+    owner_final: np.ndarray
+    renter_final: np.ndarray
+
+    @property
+    def difference(self):
+        '''After-tax net assets of owning minus renting'''
+        return self.owner_final - self.renter_final
+
+
+def _at(values, columns):
+    '''Picks one column per row from an (N, months) array'''
+    values = np.broadcast_to(values, (len(columns), values.shape[1]))
+    return np.take_along_axis(values, columns, axis=1)[:, 0]
+
+
+def as_parameter_arrays(params=None, **overrides):
+    '''Collects N parameter sets into a dict of equally shaped float arrays
+
+    Parameters
+    ----------
+    params : DataFrame or dict, optional
+        Columns or keys from PARAMETERS, missing ones use DEFAULTS
+    **overrides
+        Individual parameters given as scalars or arrays
+    '''
+    if params is None:
+        params = {}
+    elif isinstance(params, pd.DataFrame):
+        params = {name: params[name].to_numpy() for name in params.columns}
+    params = {**params, **overrides}
+    unknown = set(params) - set(PARAMETERS)
+    if unknown:
+        raise KeyError(f'Unknown parameters: {sorted(unknown)}')
+    arrays = [np.asarray(params.get(name, DEFAULTS[name]), dtype=float) for name in PARAMETERS]
+    return dict(zip(PARAMETERS, np.broadcast_arrays(*np.atleast_1d(*arrays))))
+
+
+def evaluate_scenarios(params=None, full=True, **overrides):
+    '''Evaluates the owning and renting pipelines of app.py for N parameter sets
+
+    Owner pays the amortized loan for loan_term years and then invests
+    the freed mortgage payment for time_horizont years,
+    while the apartment appreciates monthly.
+    Renter invests the down payment and the monthly difference between
+    the owner's costs and the rent for the whole loan_term + time_horizont.
+    The rent and the condominium fee are raised yearly by rent_growth and condo_growth,
+    and both also invest the extra savings every month.
+    At the end all assets are sold and the gains are taxed.
+
+    Every quantity is a closed form of the elapsed months,
+    so the scenarios broadcast along the first axis without a Python loop.
+    The mortgage payment is not rounded to whole dollars as in the page.
+
+    Parameters
+    ----------
+    params : DataFrame or dict, optional
+        N parameter sets, see as_parameter_arrays
+    full : bool
+        Returns the (N, months) paths when True,
+        otherwise only the final month is evaluated which keeps
+        memory at O(N) for very large batches
+    **overrides
+        Individual parameters given as scalars or arrays
+    '''
+    p = {name: values[:, None] for name, values in as_parameter_arrays(params, **overrides).items()}
+    loan_amount = p['apartment_price'] - p['down_payment']
+    loan_months = p['loan_term'] * 12
+    total_months = (p['loan_term'] + p['time_horizont']) * 12
+
+    if full:
+        months = np.arange(int(total_months.max()))[None, :]
+    else:
+        months = total_months - 1
+    horizon = months < total_months
+
+    payment = amortization_columns(loan_amount[:, 0], p['loan_term'][:, 0],
+                                   p['interest_rate'][:, 0], n_months=1)['Payment']
+    loan_balance = remaining_balance(loan_amount, loan_months, p['interest_rate'], months + 1)
+    apartment_value = p['apartment_price'] * np.power(1 + p['apartment_return'], (months + 1) / 12)
+    owner = investment_columns(0, payment, p['stock_return'], months - loan_months + 1)
+    # The indexed condominium fee and rent are annuities of their own, the payment stays fixed
+    renter = investment_columns(p['down_payment'], payment, p['stock_return'], months + 1)
+    for amount, indexation in ((p['apartment_condo'], p['condo_growth']), (-p['rent'], p['rent_growth'])):
+        flows = investment_columns(0, amount, p['stock_return'], months + 1, indexation)
+        renter = {name: renter[name] + flows[name] for name in renter}
+    if np.any(p['savings']):
+        savings = investment_columns(0, p['savings'], p['stock_return'], months + 1)
+        owner = {name: owner[name] + savings[name] for name in owner}
+        renter = {name: renter[name] + savings[name] for name in renter}
+
+    owner_net_assets = apartment_value + owner['Balance'] - loan_balance
+    renter_net_assets = renter['Balance']
+
+    # Column of the final month, the only column when full is False
+    last = (total_months - 1 - months[:, :1]).astype(int)
+    apartment_gain = _at(apartment_value, last) - p['apartment_price'][:, 0]
+    # A loss of the investments leaves no tax, as in ledger.account
+    owner_final = (_at(owner_net_assets, last)
+                   - apartment_gain * p['apartment_tax'][:, 0]
+                   - np.maximum(_at(owner['Interest'], last), 0) * p['stock_tax'][:, 0])
+    renter_final = _at(renter_net_assets, last) - np.maximum(_at(renter['Interest'], last), 0) * p['stock_tax'][:, 0]
+
+    def mask(values):
+        return np.where(horizon, values, np.nan)
+
+    return ScenarioResult(
+        loan_balance=mask(loan_balance),
+        apartment_value=mask(apartment_value),
+        owner_investment=mask(owner['Balance']),
+        renter_investment=mask(renter_net_assets),
+        owner_net_assets=mask(owner_net_assets),
+        renter_net_assets=mask(renter_net_assets),
+        owner_final=owner_final,
+        renter_final=renter_final,
+    )
@@ -0,0 +1,131 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# float32 halves the memory of every money column, float64 keeps whole dollars exact
+DTYPE = np.dtype(os.environ.get('SCHEDULE_DTYPE', 'float64'))
+MONTH_DTYPE = np.int16
+
+
+class Schedule:
+    '''Compact struct-of-arrays schedule
+
+    Months are stored as int16 and the Year is derived from them on demand.
+    Money columns use DTYPE and are stored as given, so schedules can share
+    their arrays without copying, and constant columns are read-only
+    broadcast views that take no memory.
+    Columns are read with schedule['Name'] like DataFrame columns,
+    but they are plain NumPy arrays, use to_frame() for a DataFrame.
+    sale_month is the month a replaced last row is valued at, see with_last_row.
+
+    Parameters
+    ----------
+    month : array_like
+        Month number of every row
+    dtype : np.dtype, optional
+        Type of the money columns, defaults to DTYPE
+    **columns : array_like or scalar
+        Money columns, scalars become constant columns
+    '''
+    __slots__ = ('month', 'columns', 'dtype', 'sale_month')
+
+    def __init__(self, month, dtype=None, **columns):
+        self.dtype = np.dtype(DTYPE if dtype is None else dtype)
+        self.month = np.asarray(month, dtype=MONTH_DTYPE)
+        self.columns = {name: self.__column(values) for name, values in columns.items()}
+        self.sale_month = None
+
+    def __column(self, values):
+        values = np.asarray(values, dtype=self.dtype)
+        if values.ndim == 0:
+            return np.broadcast_to(values, self.month.shape)
+        if values.shape != self.month.shape:
+            raise ValueError(f'Column of shape {values.shape} does not match {self.month.shape} months')
+        return values
+
+    def __len__(self):
+        return len(self.month)
+
+    def __contains__(self, name):
+        return name in ('Year', 'Month') or name in self.columns
+
+    def __getitem__(self, name):
+        if name == 'Month':
+            return self.month
+        if name == 'Year':
+            return np.ceil(self.month / 12).astype(MONTH_DTYPE)
+        return self.columns[name]
+
+    def __repr__(self):
+        return f'Schedule({len(self)} months, {list(self.columns)}, {self.dtype})'
+
+    @property
+    def nbytes(self):
+        '''Memory owned by the schedule, broadcast and shared columns counted once'''
+        arrays = {id(self.month): self.month}
+        arrays.update((id(values), values) for values in self.columns.values() if values.strides != (0,))
+        return sum(values.nbytes for values in arrays.values())
+
+    def with_columns(self, **columns):
+        '''New schedule sharing the existing columns with the given ones added'''
+        schedule = Schedule(self.month, self.dtype, **{**self.columns, **columns})
+        schedule.sale_month = self.sale_month
+        return schedule
+
+    def with_last_row(self, month, **values):
+        '''New schedule whose last row is replaced, columns not given are zeroed
+
+        Only the last row differs, but every column has to be copied
+        as the existing arrays may be shared with other schedules.
+        The row is shown at month but its values are still those of the
+        month it replaces, which is kept as sale_month for deflated.
+        '''
+        schedule = Schedule(np.append(self.month[:-1], month), self.dtype)
+        schedule.sale_month = self.valued_months()[-1]
+        for name, column in self.columns.items():
+            column = column.copy()
+            column[-1] = values.get(name, 0)
+            schedule.columns[name] = column
+        return schedule
+
+    def deflated(self, deflator):
+        '''New schedule in real terms, every money column times the factor of its month
+
+        The factors are gathered once by the valued months and broadcast
+        over all the columns, see finance_math.deflator.
+        '''
+        if not self.columns:
+            return self
+        factors = np.asarray(deflator, dtype=self.dtype)[self.valued_months()]
+        columns = np.multiply(np.stack(list(self.columns.values())), factors)
+        schedule = Schedule(self.month, self.dtype, **dict(zip(self.columns, columns)))
+        schedule.sale_month = self.sale_month
+        return schedule
+
+    def valued_months(self):
+        '''Month of the values of every row, the sale_month for a replaced last row'''
+        if self.sale_month is None:
+            return self.month
+        months = self.month.copy()
+        months[-1] = self.sale_month
+        return months
+
+    def stacked(self, *names):
+        '''Cumulative sums of the named columns for stacked charts
+
+        Row k is the sum of the first k+1 columns,
+        computed in a single (len(names), months) allocation.
+        '''
+        stacked = np.empty((len(names), len(self)), dtype=self.dtype)
+        for i, name in enumerate(names):
+            np.add(stacked[i - 1] if i else 0, self[name], out=stacked[i])
+        return stacked
+
+    def to_frame(self):
+        '''DataFrame with the Year, Month and money columns'''
+        frame = pd.DataFrame({'Year': self['Year'], 'Month': self.month})
+        for name, values in self.columns.items():
+            frame[name] = values
+        return frame
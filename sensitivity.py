@@ -0,0 +1,107 @@
+'''One-at-a-time sensitivity of owning minus renting to every input
+
+Every parameter of heatmap.AXES is moved down and up by one step around the
+inputs while the others are kept. The 2 x P perturbed scenarios and the base
+one are stacked along the leading axis of a single evaluate_scenarios pass,
+so the whole analysis costs one vectorized evaluation.
+
+    python sensitivity.py --rent 1000 --interest_rate 0.03
+'''
+import argparse
+from typing import NamedTuple
+
+import numpy as np
+
+from heatmap import AXES
+from scenarios import DEFAULTS, as_parameter_arrays, evaluate_scenarios
+
+
+# Amounts and years move by a share of their value, rates by percentage points
+RELATIVE_STEP = 0.10
+RATE_STEP = 0.01
+
+
+class Sensitivity(NamedTuple):
+    '''Owning minus renting after-tax net assets around the base inputs
+
+    low and high are the perturbed values of every parameter
+    and down and up the differences they end up with.
+    '''
+    names: tuple
+    low: np.ndarray
+    high: np.ndarray
+    base: float
+    down: np.ndarray
+    up: np.ndarray
+
+    @property
+    def swing(self):
+        '''Spread of the difference over the range of every parameter'''
+        return np.abs(self.up - self.down)
+
+    def ranked(self):
+        '''Indices of the parameters from the largest swing to the smallest'''
+        return np.argsort(-self.swing, kind='stable')
+
+
+def perturbations(names, values, relative_step=RELATIVE_STEP, rate_step=RATE_STEP):
+    '''Lower and upper values of every parameter inside its heatmap range
+
+    The rates and taxes, the axes shown in percentages,
+    move by rate_step and everything else by relative_step of its value.
+    '''
+    values = np.asarray(values, dtype=float)
+    rates = np.array([AXES[name][2] == 100 for name in names])
+    step = np.where(rates, rate_step, np.abs(values) * relative_step)
+    bounds = np.array([AXES[name][0] for name in names], dtype=float).reshape(-1, 2)
+    lower = np.minimum(bounds[:, 0], values)
+    upper = np.maximum(bounds[:, 1], values)
+    return np.clip(values - step, lower, upper), np.clip(values + step, lower, upper)
+
+
+def sensitivity(params=None, names=tuple(AXES), relative_step=RELATIVE_STEP, rate_step=RATE_STEP):
+    '''Evaluates every parameter moved down and up in one batch
+
+    Parameters
+    ----------
+    params : dict, optional
+        One parameter set, missing ones use DEFAULTS
+    names : tuple of str
+        Parameters to perturb, from heatmap.AXES
+    relative_step : float
+        Share of the value that the amounts and years move by
+    rate_step : float
+        Absolute move of the rates and taxes
+
+    Returns
+    -------
+    sensitivity : Sensitivity
+    '''
+    base = {name: float(values[0]) for name, values in as_parameter_arrays(params).items()}
+    low, high = perturbations(names, [base[name] for name in names], relative_step, rate_step)
+    n = len(names)
+    # Rows 0..n-1 move one parameter down, n..2n-1 up and the last row is the base
+    batch = {name: np.full(2 * n + 1, value) for name, value in base.items()}
+    for i, name in enumerate(names):
+        batch[name][i] = low[i]
+        batch[name][n + i] = high[i]
+    difference = evaluate_scenarios(batch, full=False).difference
+    return Sensitivity(tuple(names), low, high, float(difference[-1]), difference[:n], difference[n:2 * n])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    for name in DEFAULTS:
+        parser.add_argument(f'--{name}', type=float, default=DEFAULTS[name])
+    args = parser.parse_args(argv)
+
+    result = sensitivity(vars(args))
+    print(f'Own - Rent at the inputs: {result.base:,.0f}')
+    for i in result.ranked():
+        name = result.names[i]
+        print(f'{name:>18} {result.low[i]:>12.4g} {result.down[i] - result.base:>+12,.0f}'
+              f' {result.high[i]:>12.4g} {result.up[i] - result.base:>+12,.0f}')
+
+
+if __name__ == '__main__':
+    main()
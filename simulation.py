@@ -0,0 +1,293 @@
+import functools
+from typing import NamedTuple
+
+import numpy as np
+import streamlit as st
+from streamlit import runtime
+
+from finance_math import amortization_columns, escalation, rate_path, variable_amortization_columns
+from ledger import realization_months, run_ledger
+from pipeline import Pipeline, Stage
+from profiling import timed
+from scenarios import DEFAULTS, PARAMETERS
+from schedule import Schedule
+from store import persist
+
+
+CACHE_SIZE = 64
+
+
+class Params(NamedTuple):
+    '''Sidebar inputs of the page, rates and taxes as fractions
+
+    rate_resets turns the loan into a variable-rate one,
+    given as sorted (month, rate) pairs, see finance_math.rate_path.
+    rent_growth and condo_growth raise the rent and the condominium fee yearly.
+    prepayments are (month, amount) pairs paid on top of the instalments
+    and realize_years realizes the investment gains every given years, see ledger.
+    The realized gains of every year are taxed above tax_allowance,
+    the sold units cost by cost_method, see tax_lots.
+    '''
+    apartment_price: float = DEFAULTS['apartment_price']
+    down_payment: float = DEFAULTS['down_payment']
+    loan_term: int = DEFAULTS['loan_term']
+    interest_rate: float = DEFAULTS['interest_rate']
+    apartment_condo: float = DEFAULTS['apartment_condo']
+    apartment_return: float = DEFAULTS['apartment_return']
+    apartment_tax: float = DEFAULTS['apartment_tax']
+    rent: float = DEFAULTS['rent']
+    time_horizont: int = DEFAULTS['time_horizont']
+    stock_return: float = DEFAULTS['stock_return']
+    stock_tax: float = DEFAULTS['stock_tax']
+    rent_growth: float = DEFAULTS['rent_growth']
+    condo_growth: float = DEFAULTS['condo_growth']
+    savings: float = DEFAULTS['savings']
+    rate_resets: tuple = ()
+    prepayments: tuple = ()
+    realize_years: int = 0
+    tax_allowance: float = 0.0
+    cost_method: str = 'fifo'
+
+    def scenario_params(self):
+        '''The inputs of the vectorized scenarios, which assume a fixed rate,
+        no prepayments and the taxes at the final sale only, without an allowance'''
+        return {name: getattr(self, name) for name in PARAMETERS}
+
+    @property
+    def ledger_tax(self):
+        '''Tax rate of the ledger, the stock_tax only when gains are realized before the sale
+
+        Without realizations the balances do not depend on the tax rate and
+        the tax due at the final sale is proportional to it, so the ledger runs
+        with a rate of one and only the final rows apply the stock_tax.
+        '''
+        return self.stock_tax if self.realize_years else 1.0
+
+    def scenario_ignored(self):
+        '''Names of the inputs that are set but left out of scenario_params'''
+        return tuple(name for name in self._fields
+                     if name not in PARAMETERS and getattr(self, name) != self._field_defaults[name])
+
+
+class Result(NamedTuple):
+    '''Every frame and cash flow rendered by the page
+
+    The schedules share arrays with each other and between reruns,
+    so they must be treated as read-only.
+    '''
+    mortgage: Schedule
+    renting: Schedule
+    owning_long: Schedule
+    renting_long: Schedule
+    fcf_rent: float
+    fcf: float
+
+
+def in_real_terms(result, deflator):
+    '''The result with every schedule in the dollars of month zero
+
+    Only the cached nominal schedules are rescaled, nothing is recomputed,
+    so switching between nominal and real terms costs no simulation.
+    The first month's cash flows are kept as they are.
+    '''
+    return result._replace(**{name: getattr(result, name).deflated(deflator)
+                              for name in Result._fields if isinstance(getattr(result, name), Schedule)})
+
+
+def memoize(func):
+    '''Memoizes a function of hashable arguments with bounded LRU eviction
+
+    Inside a Streamlit session the results are stored with st.cache_data,
+    which is shared by all sessions of the server.
+    Outside Streamlit (scripts, notebooks, batch jobs)
+    a plain in-process functools.lru_cache is used instead.
+    '''
+    in_process = functools.lru_cache(maxsize=CACHE_SIZE)(func)
+    in_streamlit = None
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        nonlocal in_streamlit
+        if not runtime.exists():
+            return in_process(*args, **kwargs)
+        if in_streamlit is None:
+            in_streamlit = st.cache_data(max_entries=CACHE_SIZE, show_spinner=False)(func)
+        return in_streamlit(*args, **kwargs)
+
+    def cache_clear():
+        in_process.cache_clear()
+        if in_streamlit is not None:
+            in_streamlit.clear()
+
+    wrapper.cache_clear = cache_clear
+    return wrapper
+
+
+def _rounded(columns):
+    return {name: np.round(values) for name, values in columns.items() if name != 'Month'}
+
+
+def _loan(apartment_price, down_payment, loan_term, interest_rate, rate_resets):
+    if rate_resets:
+        rates = rate_path(interest_rate, rate_resets, loan_term * 12)
+        columns = variable_amortization_columns(apartment_price - down_payment, loan_term, rates)
+    else:
+        columns = amortization_columns(apartment_price - down_payment, loan_term, interest_rate)
+    return Schedule(columns['Month'], **_rounded(columns))
+
+
+def _prepaid_loan(apartment_price, down_payment, loan_term, interest_rate, rate_resets, prepayments, planned_loan):
+    if not prepayments:
+        return planned_loan
+    rates = rate_path(interest_rate, rate_resets, loan_term * 12)
+    columns = variable_amortization_columns(apartment_price - down_payment, loan_term, rates, prepayments)
+    return Schedule(columns['Month'], **_rounded(columns))
+
+
+def _appreciation(apartment_return, loan_term, time_horizont):
+    monthly_return = np.power(apartment_return + 1, 1/12)
+    return np.cumprod(np.full((loan_term + time_horizont) * 12, monthly_return))
+
+
+def _indexed(amount, growth, months):
+    '''Monthly amount raised yearly by growth, the scalar amount itself without growth'''
+    if not growth:
+        return amount
+    return amount * escalation(growth, np.arange(1, months + 1))
+
+
+def _mortgage(apartment_price, apartment_condo, condo_growth, loan, appreciation):
+    return loan.with_columns(Apartment=appreciation[:len(loan)] * apartment_price,
+                             Condominium=_indexed(apartment_condo, condo_growth, len(loan)))
+
+
+def _fcf(loan):
+    return loan['Payment'][0]
+
+
+def _fcf_rent(apartment_condo, rent, fcf):
+    return apartment_condo + fcf - rent
+
+
+def _ledger(apartment_condo, condo_growth, rent, rent_growth, down_payment, stock_return, ledger_tax, savings,
+            realize_years, tax_allowance, cost_method, loan_term, time_horizont, planned_loan, loan):
+    '''Both households' investment accounts over the whole horizon, see ledger.run_ledger
+
+    The budget is the planned instalment, the last one after the payoff,
+    plus the condominium fee and the extra savings.
+    So the owner invests the savings during the loan, the instalments
+    that a prepayment saves later on and the freed instalment after the payoff,
+    while the renter invests the budget left after the rent.
+    '''
+    months = (loan_term + time_horizont) * 12
+    condo = _indexed(apartment_condo, condo_growth, months)
+    instalments = np.pad(planned_loan['Payment'], (0, months - len(planned_loan)), mode='edge')
+    owner_costs = np.zeros(months)
+    owner_costs[:len(loan)] = loan['Payment']
+    if 'Prepayment' in loan:
+        owner_costs[:len(loan)] += loan['Prepayment']
+    return run_ledger(budget=instalments + condo + savings,
+                      owner_costs=owner_costs + condo,
+                      renter_costs=_indexed(rent, rent_growth, months),
+                      stock_return=stock_return,
+                      initial_values=(0.0, down_payment),
+                      tax_rate=ledger_tax,
+                      realize=realization_months(realize_years, months),
+                      allowance=tax_allowance,
+                      method=cost_method)
+
+
+def _account_schedule(account, months):
+    columns = {'Contributions': account.contributions, 'Interest': account.interest, 'Balance': account.balance}
+    return Schedule(np.arange(1, months + 1), **_rounded({name: values[:months] for name, values in columns.items()}))
+
+
+def _renting(loan_term, ledger):
+    renting = _account_schedule(ledger.renter, loan_term * 12)
+    return renting.with_columns(NetAssets=renting['Balance'])
+
+
+def _owning_schedule(apartment_price, loan, ledger, appreciation):
+    months = len(appreciation)
+    balance = np.zeros(months, dtype=loan.dtype)
+    balance[:len(loan)] = loan['Balance']
+    investing = _account_schedule(ledger.owner, months)
+    contributions, interest = investing['Contributions'], investing['Interest']
+    gain = appreciation * apartment_price - apartment_price
+    return Schedule(np.arange(0, months),
+                    Balance=balance,
+                    Contributions=contributions,
+                    Interest=interest,
+                    Apartment=apartment_price,
+                    ApartmentGain=gain,
+                    NetAssets=apartment_price + gain + contributions + interest - balance)
+
+
+def _sale_tax(account, stock_tax, realize_years):
+    '''Tax of the final sale, the ledger ran with a rate of one without realizations, see Params.ledger_tax'''
+    return np.round(account.sale_tax if realize_years else stock_tax * account.sale_tax)
+
+
+def _owning_long(loan_term, time_horizont, apartment_tax, stock_tax, realize_years, owning_schedule, ledger):
+    df = owning_schedule
+    sale_tax = _sale_tax(ledger.owner, stock_tax, realize_years)
+    return df.with_last_row((loan_term+time_horizont)*12+12,
+                            NetAssets=df['NetAssets'][-1] - df['ApartmentGain'][-1]*apartment_tax - sale_tax)
+
+
+def _renting_schedule(loan_term, time_horizont, ledger):
+    df_invest = _account_schedule(ledger.renter, (loan_term+time_horizont)*12)
+    return df_invest.with_columns(NetAssets=df_invest['Contributions'] + df_invest['Interest'])
+
+
+def _renting_long(loan_term, time_horizont, stock_tax, realize_years, renting_schedule, ledger):
+    df_invest = renting_schedule
+    sale_tax = _sale_tax(ledger.renter, stock_tax, realize_years)
+    return df_invest.with_last_row((loan_term+time_horizont)*12+12,
+                                   NetAssets=df_invest['NetAssets'][-1] - sale_tax)
+
+
+# The final sale only touches the last row, so the apartment tax and,
+# without realizations, the stock tax rerun only the *_long stages and none
+# of the schedules. The allowance and the cost method belong to the ledger,
+# as does the stock tax once gains are realized before the sale.
+PIPELINE = Pipeline([
+    Stage('planned_loan', _loan, ('apartment_price', 'down_payment', 'loan_term', 'interest_rate', 'rate_resets')),
+    Stage('loan', _prepaid_loan, ('apartment_price', 'down_payment', 'loan_term', 'interest_rate', 'rate_resets',
+                                  'prepayments'), ('planned_loan',)),
+    Stage('appreciation', _appreciation, ('apartment_return', 'loan_term', 'time_horizont')),
+    Stage('mortgage', _mortgage, ('apartment_price', 'apartment_condo', 'condo_growth'), ('loan', 'appreciation')),
+    Stage('fcf', _fcf, (), ('loan',)),
+    Stage('fcf_rent', _fcf_rent, ('apartment_condo', 'rent'), ('fcf',)),
+    Stage('ledger', _ledger, ('apartment_condo', 'condo_growth', 'rent', 'rent_growth', 'down_payment', 'stock_return',
+                              'ledger_tax', 'savings', 'realize_years', 'tax_allowance', 'cost_method',
+                              'loan_term', 'time_horizont'),
+          ('planned_loan', 'loan')),
+    Stage('renting', _renting, ('loan_term',), ('ledger',)),
+    Stage('owning_schedule', _owning_schedule, ('apartment_price',), ('loan', 'ledger', 'appreciation')),
+    Stage('owning_long', _owning_long, ('loan_term', 'time_horizont', 'apartment_tax', 'stock_tax', 'realize_years'),
+          ('owning_schedule', 'ledger')),
+    Stage('renting_schedule', _renting_schedule, ('loan_term', 'time_horizont'), ('ledger',)),
+    Stage('renting_long', _renting_long, ('loan_term', 'time_horizont', 'stock_tax', 'realize_years'),
+          ('renting_schedule', 'ledger')),
+], cache_size=CACHE_SIZE)
+
+
+@memoize
+@persist
+@timed
+def simulate(params: Params) -> Result:
+    '''Computes every schedule of the page for one set of sidebar inputs
+
+    Results are looked up in memory first and then in the local result store,
+    so a shared link or a restarted server does not recompute them.
+    On a miss only the stages of PIPELINE whose inputs changed
+    since an earlier call are recomputed, see PIPELINE.stats() for the counters.
+
+    Parameters
+    ----------
+    params : Params
+        Sidebar inputs, also the cache key
+    '''
+    outputs = PIPELINE.run(params)
+    return Result(**{name: outputs[name] for name in Result._fields})
@@ -0,0 +1,129 @@
+'''Local SQLite store of computed results shared by sessions and server restarts
+
+Results are pickled under the hash of their inputs and the MODEL_VERSION.
+Opening a store written by another model version drops its results,
+and the total size is capped with least recently used eviction.
+Set RESULT_STORE to another path, or to an empty string to disable the store.
+'''
+import functools
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from scenarios import MODEL_VERSION
+
+
+STORE_PATH = os.environ.get('RESULT_STORE',
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'results.sqlite'))
+MAX_BYTES = int(os.environ.get('RESULT_STORE_MAX_MB', 256)) * 2**20
+# Layout of the tables, bumped when they change
+SCHEMA_VERSION = 1
+
+
+def params_key(params):
+    '''Hash of a NamedTuple or mapping of inputs together with the model version'''
+    if hasattr(params, '_asdict'):
+        params = params._asdict()
+    spec = [MODEL_VERSION, sorted(params.items())]
+    return hashlib.sha1(json.dumps(spec, default=float).encode()).hexdigest()
+
+
+class ResultStore:
+    '''Pickled results by key in a SQLite file with a size cap
+
+    Every thread uses its own connection, the write-ahead log lets
+    readers of other sessions and processes proceed while one writes.
+
+    Parameters
+    ----------
+    path : str
+        SQLite file, created with its directory when missing
+    max_bytes : int
+        Total size of the pickled results above which the least recently used are evicted
+    '''
+
+    def __init__(self, path=STORE_PATH, max_bytes=MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as db:
+            db.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)')
+            versions = dict(db.execute('SELECT name, value FROM meta'))
+            if versions != {'schema': SCHEMA_VERSION, 'model': MODEL_VERSION}:
+                db.execute('DROP TABLE IF EXISTS results')
+                db.executemany('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                               [('schema', SCHEMA_VERSION), ('model', MODEL_VERSION)])
+            db.execute('CREATE TABLE IF NOT EXISTS results '
+                       '(key TEXT PRIMARY KEY, value BLOB, size INTEGER, accessed REAL)')
+
+    def _connection(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path, timeout=10)
+            db.execute('PRAGMA journal_mode=WAL')
+        return db
+
+    def get(self, key):
+        '''The stored result, None when it is missing or cannot be read anymore'''
+        with self._connection() as db:
+            row = db.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            try:
+                value = pickle.loads(row[0])
+            except Exception:
+                db.execute('DELETE FROM results WHERE key = ?', (key,))
+                return None
+            db.execute('UPDATE results SET accessed = ? WHERE key = ?', (time.time(), key))
+        return value
+
+    def put(self, key, value):
+        '''Stores a result and evicts the least recently used ones above max_bytes'''
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._connection() as db:
+            db.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)', (key, blob, len(blob), time.time()))
+            db.execute('DELETE FROM results WHERE key IN ('
+                       'SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY accessed DESC) AS total FROM results) '
+                       'WHERE total > ?)', (self.max_bytes,))
+
+    def stats(self):
+        '''Number of stored results and their total size in bytes'''
+        with self._connection() as db:
+            count, size = db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results').fetchone()
+        return {'results': count, 'bytes': size}
+
+    def clear(self):
+        with self._connection() as db:
+            db.execute('DELETE FROM results')
+
+
+@functools.lru_cache(maxsize=None)
+def default_store():
+    '''The store at STORE_PATH, None when RESULT_STORE disables it'''
+    return ResultStore(STORE_PATH) if STORE_PATH else None
+
+
+def persist(func):
+    '''Loads the results of a function of one inputs NamedTuple from the store
+
+    On a miss the function is called and its result stored for the next
+    session or server process with the same inputs.
+    '''
+    @functools.wraps(func)
+    def wrapper(params):
+        store = default_store()
+        if store is None:
+            return func(params)
+        key = params_key(params)
+        result = store.get(key)
+        if result is None:
+            result = func(params)
+            store.put(key, result)
+        return result
+
+    return wrapper
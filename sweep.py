@@ -0,0 +1,119 @@
+'''Parallel parameter sweep of the owning vs renting comparison
+
+Evaluates the full grid of the given parameter axes with
+scenarios.evaluate_scenarios and stores the after-tax net assets of
+owning and renting in a memory-mapped .npy file of shape grid + (2,).
+
+    python sweep.py --apartment_price 100000:500000:41 --interest_rate 0.01:0.08:36 \
+        --rent 500:2000:31 --time_horizont 1:50:50 --output sweep.npy
+'''
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from scenarios import DEFAULTS, PARAMETERS, evaluate_scenarios
+
+
+OWNER, RENTER = 0, 1
+
+
+def parse_axis(text):
+    '''Parses 'start:stop:num' into a linspace or 'a,b,c' into a list of values'''
+    if ':' in text:
+        start, stop, num = text.split(':')
+        return np.linspace(float(start), float(stop), int(num)).tolist()
+    return [float(value) for value in text.split(',')]
+
+
+def _run_chunk(output, axes, fixed, start, stop):
+    '''Evaluates the flat grid cells [start, stop) and writes them to the memmap'''
+    names = list(axes)
+    shape = tuple(len(values) for values in axes.values())
+    index = np.unravel_index(np.arange(start, stop), shape)
+    params = {name: np.asarray(axes[name])[i] for name, i in zip(names, index)}
+    result = evaluate_scenarios(params, full=False, **fixed)
+
+    results = np.load(output, mmap_mode='r+').reshape(-1, 2)
+    results[start:stop, OWNER] = result.owner_final
+    results[start:stop, RENTER] = result.renter_final
+    results.flush()
+    return stop - start
+
+
+def run_sweep(axes, output, fixed=None, workers=None, chunk_size=50_000):
+    '''Evaluates every combination of the axes across a process pool
+
+    Workers receive only the axes and a range of flat cell indices,
+    and write their results straight into the shared memory-mapped file,
+    so no per-cell objects are pickled between the processes.
+
+    Parameters
+    ----------
+    axes : dict
+        Values of every swept parameter, the grid is their outer product
+    output : str
+        Path of the .npy file, the axes are stored next to it as .axes.json
+    fixed : dict, optional
+        Non-swept parameters, missing ones use DEFAULTS
+    workers : int, optional
+        Number of processes, defaults to the number of CPUs
+    chunk_size : int
+        Grid cells per task
+
+    Returns
+    -------
+    results : np.memmap
+        After-tax net assets of owning and renting, shape grid + (2,)
+    stats : dict
+        Number of scenarios, seconds and scenarios per second
+    '''
+    fixed = {name: value for name, value in (fixed or {}).items() if name not in axes}
+    unknown = (set(axes) | set(fixed)) - set(PARAMETERS)
+    if unknown:
+        raise KeyError(f'Unknown parameters: {sorted(unknown)}')
+    axes = {name: list(map(float, values)) for name, values in axes.items()}
+    shape = tuple(len(values) for values in axes.values())
+    n = int(np.prod(shape))
+
+    results = np.lib.format.open_memmap(output, mode='w+', dtype=np.float64, shape=shape + (2,))
+    del results
+    with open(os.path.splitext(output)[0] + '.axes.json', 'w') as f:
+        json.dump({'axes': axes, 'fixed': {**DEFAULTS, **fixed}, 'columns': ['owner', 'renter']}, f)
+
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_run_chunk, output, axes, fixed, start, min(start + chunk_size, n))
+                   for start in range(0, n, chunk_size)]
+        done = sum(future.result() for future in futures)
+    seconds = time.perf_counter() - start_time
+
+    stats = {'scenarios': done, 'seconds': seconds, 'scenarios_per_second': done / seconds}
+    return np.load(output, mmap_mode='r'), stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    for name in PARAMETERS:
+        parser.add_argument(f'--{name}', type=parse_axis, help=f'start:stop:num or a,b,c (default {DEFAULTS[name]})')
+    parser.add_argument('--output', default='sweep.npy')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=50_000)
+    args = parser.parse_args(argv)
+
+    values = {name: getattr(args, name) for name in PARAMETERS if getattr(args, name) is not None}
+    axes = {name: axis for name, axis in values.items() if len(axis) > 1}
+    fixed = {name: axis[0] for name, axis in values.items() if len(axis) == 1}
+    if not axes:
+        parser.error('give at least one parameter with several values')
+
+    results, stats = run_sweep(axes, args.output, fixed, args.workers, args.chunk_size)
+    print(f'{stats["scenarios"]:,} scenarios in {stats["seconds"]:.2f} s '
+          f'({stats["scenarios_per_second"]:,.0f} scenarios/s) -> {args.output} {results.shape}')
+
+
+if __name__ == '__main__':
+    main()
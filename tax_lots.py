@@ -0,0 +1,176 @@
+'''Tax lots of an investment account and the capital gains tax of their sales
+
+Every deposit buys a lot of units at the unit price of its month and every
+withdrawal sells units, the first bought first (FIFO) or at the average cost
+of the held units. Both are expressed with cumulative sums of the bought and
+sold units, so the cost of any sale is looked up with np.searchsorted in the
+cumulative lots instead of a Python loop over the lots or the months.
+
+The realized gains are taxed per year after a yearly tax-free allowance,
+and the losses of a year are carried forward to offset later gains.
+'''
+from typing import NamedTuple
+
+import numpy as np
+
+
+METHODS = ('fifo', 'average')
+
+
+class Lots(NamedTuple):
+    '''Realized gains and the held lots of every month, shape (..., months)'''
+    gains: np.ndarray
+    basis: np.ndarray
+    units: np.ndarray
+
+
+def _searchsorted_rows(rows, values):
+    '''np.searchsorted of every row of values in the same row of the sorted rows
+
+    The rows are shifted apart by a multiple of their span and searched
+    at once in one flat array, so there is no loop over the rows either.
+    '''
+    if rows.ndim == 1:
+        return np.searchsorted(rows, values)
+    flat_rows = rows.reshape(-1, rows.shape[-1])
+    flat_values = values.reshape(-1, values.shape[-1])
+    low = min(flat_rows.min(), flat_values.min())
+    span = max(flat_rows.max(), flat_values.max()) - low + 1
+    offset = np.arange(len(flat_rows))[:, None] * span - low
+    index = np.searchsorted((flat_rows + offset).ravel(), (flat_values + offset).ravel())
+    index = index.reshape(flat_values.shape) - np.arange(len(flat_rows))[:, None] * rows.shape[-1]
+    return index.reshape(values.shape)
+
+
+def sold_units(bought, requested):
+    '''Cumulative units sold when a sale can not exceed the held units
+
+    The held units never go below zero, S_k = min(S_(k-1) + r_k, B_k),
+    which unrolls to the running minimum S_k = R_k + min(0, min_(j<=k) (B_j - R_j)).
+    A withdrawal beyond the held units is borrowed and realizes no gain.
+
+    Parameters
+    ----------
+    bought, requested : array_like
+        Cumulative bought and requested units along the last axis
+    '''
+    return requested + np.minimum(np.minimum.accumulate(bought - requested, axis=-1), 0)
+
+
+def _fifo(prices, initial_value, costs, bought, sold):
+    '''Gains and held basis when the first bought units are sold first
+
+    The cost of the first u units is piecewise linear in u with the price
+    of the lot as the slope, so it is found with one searchsorted of u
+    in the cumulative bought units, led by nothing and the initial lot.
+    '''
+    zero = np.zeros(sold.shape[:-1] + (1,))
+    initial_value = zero + initial_value
+    bought = np.concatenate((zero, initial_value, bought), axis=-1)
+    costs = np.concatenate((zero, initial_value, costs), axis=-1)
+    lot_prices = np.concatenate((zero + 1, zero + 1, prices), axis=-1)
+    lot = np.clip(_searchsorted_rows(bought, sold), 1, bought.shape[-1] - 1)
+    previous = lot - 1
+    sold_cost = (np.take_along_axis(costs, previous, axis=-1)
+                 + (sold - np.take_along_axis(bought, previous, axis=-1)) * np.take_along_axis(lot_prices, lot, axis=-1))
+    proceeds = np.diff(sold, axis=-1, prepend=0) * prices
+    return proceeds - np.diff(sold_cost, axis=-1, prepend=0), costs[..., 2:] - sold_cost
+
+
+def _average(prices, deposits, bought, sold):
+    '''Gains and held basis when the units are sold at their average cost
+
+    A sale keeps the share a_k of the held cost that it keeps of the held units,
+    H_k = a_k (H_(k-1) + c_k), which is a cumulative product and sum
+    restarted after every month that sells all the units.
+    '''
+    zero = np.zeros(sold.shape[:-1] + (1,))
+    sold_before = np.concatenate((zero, sold[..., :-1]), axis=-1)
+    units_before = bought - sold_before
+    sales = sold - sold_before
+    with np.errstate(divide='ignore', invalid='ignore'):
+        kept = np.where(units_before > 0, 1 - sales / units_before, 1.0)
+    # Selling everything leaves rounding errors, zero restarts the products
+    kept = np.where(kept < 1e-12, 0.0, kept)
+    emptied = kept == 0
+    factor = np.cumprod(np.where(emptied, 1.0, kept), axis=-1)
+    total = np.cumsum(deposits / np.concatenate((zero + 1, factor[..., :-1]), axis=-1), axis=-1)
+    last = np.maximum.accumulate(np.where(emptied, np.arange(sold.shape[-1]), -1), axis=-1)
+    restart = np.where(last >= 0, np.take_along_axis(total, np.maximum(last, 0), axis=-1), 0.0)
+    basis = factor * (total - restart)
+    basis_before = np.concatenate((zero, basis[..., :-1]), axis=-1) + deposits
+    return sales * prices - (1 - kept) * basis_before, basis
+
+
+def lots(prices, flows, initial_value=0.0, method='fifo'):
+    '''Realized gains of the withdrawals and the held lots of an account
+
+    Parameters
+    ----------
+    prices : array_like
+        Unit price of every month, e.g. the cumulative growth of the account
+    flows : array_like
+        Deposit, or withdrawal when negative, at the end of every month
+    initial_value : float or array_like
+        Lot bought at month zero at the unit price of one
+    method : str
+        'fifo' or 'average' cost of the sold units
+
+    Returns
+    -------
+    lots : Lots
+    '''
+    if method not in METHODS:
+        raise ValueError(f'Unknown cost method: {method}')
+    flows = np.asarray(flows, dtype=float)
+    prices = np.broadcast_to(np.asarray(prices, dtype=float), np.broadcast_shapes(np.shape(prices), flows.shape))
+    flows = np.broadcast_to(flows, prices.shape)
+    deposits = np.maximum(flows, 0)
+    initial_value = np.maximum(np.asarray(initial_value, dtype=float), 0)[..., None]
+    bought = initial_value + np.cumsum(deposits / prices, axis=-1)
+    sold = sold_units(bought, np.cumsum(np.maximum(-flows, 0) / prices, axis=-1))
+    if method == 'fifo':
+        costs = initial_value + np.cumsum(deposits, axis=-1)
+        gains, basis = _fifo(prices, initial_value, costs, bought, sold)
+    else:
+        deposits = deposits.copy()
+        deposits[..., 0] += initial_value[..., 0]
+        gains, basis = _average(prices, deposits, bought, sold)
+    return Lots(gains, basis, bought - sold)
+
+
+def yearly_tax(gains, tax_rate, allowance=0.0, carried_loss=0.0):
+    '''Tax of the realized gains of every year with loss carry-forward
+
+    The allowance makes the first gains of every year tax-free and is not carried over.
+    A net loss is carried forward until later gains use it up,
+    L_y = max(0, L_(y-1) - n_y), which is a running minimum of the
+    cumulative net gains instead of a loop over the years.
+
+    Parameters
+    ----------
+    gains : array_like
+        Realized gains of every month, whole years along the last axis
+    tax_rate : float or array_like
+        Tax on the taxable gains
+    allowance : float or array_like
+        Tax-free gains of every year
+    carried_loss : float or array_like
+        Loss carried forward from the earlier years
+
+    Returns
+    -------
+    tax : np.ndarray
+        Tax of every year
+    carried_loss : np.ndarray
+        Loss left to carry forward after the last year
+    '''
+    gains = np.asarray(gains, dtype=float)
+    net = gains.reshape(gains.shape[:-1] + (-1, 12)).sum(axis=-1)
+    net = net - np.minimum(np.maximum(net, 0), np.asarray(allowance)[..., None])
+    walk = np.asarray(carried_loss, dtype=float)[..., None] - np.cumsum(net, axis=-1)
+    losses = walk - np.minimum(np.minimum.accumulate(walk, axis=-1), 0)
+    previous = np.concatenate((np.broadcast_to(np.asarray(carried_loss, dtype=float)[..., None],
+                                               losses.shape[:-1] + (1,)), losses[..., :-1]), axis=-1)
+    taxable = net - previous + losses
+    return np.asarray(tax_rate)[..., None] * taxable, losses[..., -1]
@@ -0,0 +1,10 @@
+'''Correctness tests of the models behind app.py
+
+    python -m pytest -q tests
+'''
+import os
+import sys
+
+# The tests compute every result, none is read from or written to the local store
+os.environ['RESULT_STORE'] = ''
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
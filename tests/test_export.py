@@ -0,0 +1,47 @@
+import json
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import pytest
+
+from export import FRAMES, export_batch, result_table, to_bytes
+from scenarios import evaluate_scenarios
+from simulation import Params, simulate
+
+
+def read(data, file_format):
+    if file_format == 'parquet':
+        return pq.read_table(pa.BufferReader(data))
+    return pa.ipc.open_file(pa.BufferReader(data)).read_all()
+
+
+@pytest.mark.parametrize('file_format', ['parquet', 'arrow'])
+def test_result_round_trip(file_format):
+    params = Params(rent=1_000)
+    result = simulate(params)
+    table = read(to_bytes(result_table(result, params), file_format), file_format)
+    frames = table.column('frame').to_pylist()
+    for name in FRAMES:
+        rows = table.filter(pc.equal(table.column('frame'), name))
+        schedule = getattr(result, name)
+        assert frames.count(name) == len(schedule)
+        np.testing.assert_array_equal(rows.column('Month').to_numpy(), schedule['Month'])
+        np.testing.assert_array_equal(rows.column('NetAssets').to_numpy(zero_copy_only=False),
+                                      schedule['NetAssets'] if 'NetAssets' in schedule else np.nan)
+    assert json.loads(table.schema.metadata[b'params'])['rent'] == 1_000
+
+
+def test_batch_round_trip(tmp_path):
+    path = str(tmp_path / 'batch.parquet')
+    axes = {'rent': [600.0, 1_200.0], 'time_horizont': [1, 5, 10]}
+    rows = export_batch(axes, path, batch_size=4)
+    table = pq.read_table(path)
+    assert table.num_rows == rows == sum((25 + years) * 12 for years in axes['time_horizont']) * 2
+    assert pq.ParquetFile(path).num_row_groups == 2
+    finals = table.group_by('scenario').aggregate([('renter_final', 'max'), ('rent', 'max'),
+                                                   ('time_horizont', 'max')]).sort_by('scenario')
+    expected = evaluate_scenarios({'rent': finals.column('rent_max').to_numpy(),
+                                   'time_horizont': finals.column('time_horizont_max').to_numpy()}, full=False)
+    np.testing.assert_allclose(finals.column('renter_final_max').to_numpy(), expected.renter_final)
@@ -0,0 +1,33 @@
+import numpy as np
+
+from finance_math import rate_path, variable_amortization_columns
+
+
+def amortization_loop(P, T, rates, prepayments):
+    '''Month by month reference, re-amortized at every reset and after every prepayment'''
+    t_months = T * 12
+    prepaid = dict(prepayments)
+    payment, balance, prepayment = np.zeros((3, t_months))
+    remaining, instalment = P, None
+    for k in range(t_months):
+        r = rates[k] / 12
+        if instalment is None or rates[k] != rates[k - 1] or k in prepaid:
+            instalment = remaining * r / (1 - (1 + r) ** -(t_months - k))
+        remaining = remaining * (1 + r) - instalment
+        # The prepayment of month k + 1 is paid with its instalment
+        prepayment[k] = min(prepaid.get(k + 1, 0.0), remaining)
+        remaining -= prepayment[k]
+        payment[k], balance[k] = instalment, remaining
+    return payment, balance, prepayment
+
+
+def test_rate_reset_and_prepayment_equal_the_loop():
+    prepayments = ((24, 20_000.0), (90, 1e9))
+    rates = rate_path(0.03, ((36, 0.05),), 10 * 12)
+    columns = variable_amortization_columns(200_000.0, 10, rates, prepayments)
+    payment, balance, prepayment = amortization_loop(200_000.0, 10, rates, prepayments)
+    np.testing.assert_allclose(columns['Payment'][:90], payment[:90])
+    np.testing.assert_allclose(columns['Balance'], balance, atol=1e-6)
+    np.testing.assert_allclose(columns['Prepayment'], prepayment)
+    # The second prepayment pays the loan off
+    assert columns['Balance'][89] == 0
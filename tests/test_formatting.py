@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from formatting import LOOP_SIZE, money, money_array
+
+
+# Half cents and tenths just below or above the half, ties, huge and non-finite amounts
+EDGES = [0.015, 2.675, 0.005, -0.005, 0.125, 1.005, 999.95, 999_950, 950, -1_234_567.891,
+         1e17, -3e18, 9.9e16, 0.0, -0.0, np.inf, -np.inf, np.nan]
+
+
+@pytest.mark.parametrize('size', [len(EDGES), LOOP_SIZE + len(EDGES)])
+@pytest.mark.parametrize('cents', [False, True])
+@pytest.mark.parametrize('compact', [False, True])
+@pytest.mark.parametrize('markdown', [False, True])
+def test_money_array_equals_money(size, cents, compact, markdown):
+    # Both the loop over small arrays and the vectorized path
+    amounts = np.resize(EDGES + list(np.random.default_rng(0).normal(0, 1e6, LOOP_SIZE)), size)
+    expected = [money(float(amount), cents, compact, markdown) for amount in amounts]
+    assert money_array(amounts, cents, compact, markdown).tolist() == expected
+
+
+def test_money_half_cents():
+    assert money(0.015, cents=True) == '$0.01'
+    assert money(2.675, cents=True) == '$2.67'
+    assert money(0.005, cents=True) == '$0.01'
+    assert money(-1_234_567, compact=True) == '-$1.2M'
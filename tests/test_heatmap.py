@@ -0,0 +1,33 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from heatmap import compute_grid, covers, interpolate, load_grid
+from scenarios import evaluate_scenarios
+
+
+def test_interpolate_inside_and_covers():
+    grid = compute_grid('rent', 'apartment_return', resolution=11)
+    np.testing.assert_allclose(interpolate(grid, grid.x[3], grid.y[7]), grid.z[7, 3])
+    # Linear in the rent between two nodes of the same row
+    exact = evaluate_scenarios(full=False, rent=900, apartment_return=grid.y[7]).difference[0]
+    assert covers(grid, 900, grid.y[7])
+    np.testing.assert_allclose(interpolate(grid, 900, grid.y[7]), exact, rtol=1e-6)
+
+
+def test_covers_rejects_inputs_outside_the_grid():
+    grid = compute_grid('rent', 'apartment_return', resolution=11)
+    assert not covers(grid, 5_000, 0.01)
+    assert not covers(grid, 900, -0.1)
+
+
+def test_concurrent_sessions_share_one_stored_grid(tmp_path):
+    # Sessions are threads of one process, every writer uses its own temporary file
+    for resolution in range(5, 25):
+        with ThreadPoolExecutor(8) as pool:
+            grids = list(pool.map(lambda _: load_grid('rent', 'stock_return', resolution=resolution,
+                                                      cache_dir=str(tmp_path)), range(8)))
+        stored = load_grid('rent', 'stock_return', resolution=resolution, cache_dir=str(tmp_path))
+        for grid in grids:
+            np.testing.assert_array_equal(grid.z, stored.z)
+    assert {path.suffix for path in tmp_path.iterdir()} == {'.npz'}
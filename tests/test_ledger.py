@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from ledger import account
+
+
+@pytest.mark.parametrize('allowance', [0.0, 500.0, 1e6])
+def test_account_without_realizations_equals_the_closed_form(allowance):
+    g, c, months = 1.005, 100.0, 120
+    result = account(g, 1_000.0, np.full(months, c), tax_rate=0.3, allowance=allowance)
+    balance = 1_000.0 * g**months + c * (g**months - 1) / (g - 1)
+    contributions = 1_000.0 + c * months
+    np.testing.assert_allclose(result.balance[-1], balance)
+    np.testing.assert_allclose(result.contributions[-1], contributions)
+    np.testing.assert_allclose(result.basis, result.contributions)
+    np.testing.assert_allclose(result.sale_tax, 0.3 * max(balance - contributions - allowance, 0))
+
+
+def test_realization_pays_the_tax_and_resets_the_basis():
+    # The balance doubles every year, the gain of 100 realized after the first
+    # one is taxed 50 and the remaining 150 doubles to a gain of 150 at the sale
+    result = account(2 ** (1 / 12), 100.0, np.zeros(24), tax_rate=0.5, realize=(12,))
+    np.testing.assert_allclose(result.taxes[[10, 11, -1]], [0.0, 50.0, 50.0])
+    np.testing.assert_allclose(result.balance[[11, -1]], [150.0, 300.0])
+    np.testing.assert_allclose(result.basis[[11, -1]], [150.0, 150.0])
+    np.testing.assert_allclose(result.sale_tax, 75.0)
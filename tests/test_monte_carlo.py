@@ -0,0 +1,18 @@
+import numpy as np
+import pytest
+
+from monte_carlo import simulate_monte_carlo
+from scenarios import DEFAULTS, evaluate_scenarios
+
+
+@pytest.mark.parametrize('overrides', [
+    {},
+    # The renter withdraws once the indexed rent exceeds the owner's costs
+    {'rent_growth': 0.03, 'condo_growth': 0.02, 'savings': 100},
+])
+def test_zero_volatility_equals_scenarios(overrides):
+    params = {**DEFAULTS, **overrides}
+    result = simulate_monte_carlo(params, n_paths=3, stock_vol=0.0, apartment_vol=0.0, seed=0)
+    expected = evaluate_scenarios(params, full=False)
+    np.testing.assert_allclose(result.owner_final, expected.owner_final[0], rtol=1e-9)
+    np.testing.assert_allclose(result.renter_final, expected.renter_final[0], rtol=1e-9)
@@ -0,0 +1,61 @@
+import pytest
+
+from pipeline import Pipeline, Stage
+from simulation import PIPELINE, Params
+
+
+def counting_pipeline(calls, cache_size=64):
+    '''a -> b -> c with d beside them, every call is appended to calls'''
+    def stage(name):
+        def func(**kwargs):
+            calls.append(name)
+            return (name, tuple(sorted(kwargs.items())))
+        return func
+    return Pipeline([
+        Stage('a', stage('a'), ('x',)),
+        Stage('b', stage('b'), ('y',), ('a',)),
+        Stage('c', stage('c'), (), ('b',)),
+        Stage('d', stage('d'), ('z',)),
+    ], cache_size=cache_size)
+
+
+def test_only_the_stages_downstream_of_a_change_rerun():
+    calls = []
+    pipeline = counting_pipeline(calls)
+    first = pipeline.run({'x': 1, 'y': 1, 'z': 1})
+    assert calls == ['a', 'b', 'c', 'd']
+    calls.clear()
+    assert pipeline.run({'x': 1, 'y': 2, 'z': 1})['a'] is first['a']
+    assert calls == ['b', 'c']
+    calls.clear()
+    pipeline.run({'x': 1, 'y': 1, 'z': 1})
+    assert calls == []
+    assert pipeline.stats()['b'] == {'hits': 1, 'misses': 2}
+
+
+def test_least_recently_used_outputs_are_evicted():
+    calls = []
+    pipeline = counting_pipeline(calls, cache_size=2)
+    for x in (1, 2, 1, 3, 1, 2):
+        pipeline.run({'x': x, 'y': 0, 'z': 0})
+    # 2 is evicted by 3 as 1 was used after it
+    assert [name for name in calls if name == 'a'] == ['a'] * 4
+
+
+def test_stages_must_follow_their_inputs():
+    with pytest.raises(ValueError, match='unknown stages'):
+        Pipeline([Stage('b', dict, (), ('a',)), Stage('a', dict)])
+
+
+@pytest.mark.parametrize('change, misses', [
+    ({'apartment_tax': 0.2}, {'owning_long'}),
+    ({'rent': 900}, {'fcf_rent', 'ledger', 'renting', 'owning_schedule', 'owning_long',
+                     'renting_schedule', 'renting_long'}),
+    ({'apartment_return': 0.02}, {'appreciation', 'mortgage', 'owning_schedule', 'owning_long'}),
+])
+def test_page_inputs_rerun_only_their_stages(change, misses):
+    PIPELINE.run(Params())
+    before = PIPELINE.stats()
+    PIPELINE.run(Params(**change))
+    after = PIPELINE.stats()
+    assert {name for name in after if after[name]['misses'] > before[name]['misses']} == misses
@@ -0,0 +1,16 @@
+import numpy as np
+import pytest
+
+from plotting import downsample_indices
+from simulation import Params, simulate
+
+
+@pytest.mark.parametrize('method', ['yearly', 'lttb'])
+def test_downsampling_keeps_the_pre_sale_row(method):
+    result = simulate(Params(loan_term=50, time_horizont=100))
+    for df in (result.owning_long, result.renting_long):
+        index = downsample_indices(df, df['NetAssets'], method=method)
+        assert len(index) < len(df)
+        # The values the page quotes before and after the sale
+        assert {len(df) - 2, len(df) - 1} <= set(index.tolist())
+        assert np.all(np.diff(index) > 0)
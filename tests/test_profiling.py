@@ -0,0 +1,14 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import profiling
+
+
+def test_concurrent_exports_publish_whole_files(tmp_path):
+    profiling.reset()
+    profiling.record('simulate', 0.002)
+    path = str(tmp_path / 'metrics.prom')
+    with ThreadPoolExecutor(8) as pool:
+        assert set(pool.map(lambda _: profiling.export(path), range(64))) == {path}
+    assert [entry.name for entry in tmp_path.iterdir()] == ['metrics.prom']
+    assert open(path).read() == profiling.prometheus_text()
+    profiling.reset()
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scenarios import DEFAULTS, as_parameter_arrays, evaluate_scenarios
+
+
+BATCH = {'rent': [600.0, 850.0, 1_400.0], 'loan_term': [10, 25, 30], 'time_horizont': [5, 1, 20]}
+
+
+def test_batch_equals_every_scenario_alone():
+    batch = evaluate_scenarios(BATCH)
+    for i in range(3):
+        alone = evaluate_scenarios({name: values[i] for name, values in BATCH.items()})
+        months = (BATCH['loan_term'][i] + BATCH['time_horizont'][i]) * 12
+        np.testing.assert_allclose(batch.owner_net_assets[i, :months], alone.owner_net_assets[0])
+        np.testing.assert_allclose(batch.renter_final[i], alone.renter_final[0])
+        # Past its own horizon a scenario is NaN
+        assert np.isnan(batch.loan_balance[i, months:]).all()
+
+
+def test_final_months_only_equal_the_full_paths():
+    full, final = evaluate_scenarios(pd.DataFrame(BATCH)), evaluate_scenarios(BATCH, full=False)
+    months = (np.array(BATCH['loan_term']) + BATCH['time_horizont']) * 12
+    np.testing.assert_allclose(final.owner_net_assets[:, 0], full.owner_net_assets[np.arange(3), months - 1])
+    np.testing.assert_allclose(final.difference, full.difference)
+
+
+def test_paid_off_loan_and_defaults():
+    result = evaluate_scenarios(full=False)
+    np.testing.assert_allclose(result.loan_balance, 0.0, atol=1e-6)
+    assert as_parameter_arrays()['rent'].tolist() == [DEFAULTS['rent']]
+    with pytest.raises(KeyError, match='Unknown parameters'):
+        as_parameter_arrays(inflation=0.02)
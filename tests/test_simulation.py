@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from finance_math import deflator
+from scenarios import evaluate_scenarios
+from pipeline import Pipeline
+from simulation import PIPELINE, Params, in_real_terms, simulate
+
+
+def test_real_sale_row_is_deflated_at_the_sale_month():
+    # Without taxes the sale leaves the last values as they are, in real terms too
+    params = Params(stock_tax=0.0, apartment_tax=0.0)
+    factors = deflator(0.02, (params.loan_term + params.time_horizont + 1) * 12)
+    real = in_real_terms(simulate(params), factors)
+    outputs = PIPELINE.run(params)
+    for long, schedule in (('owning_long', 'owning_schedule'), ('renting_long', 'renting_schedule')):
+        before_sale = outputs[schedule].deflated(factors)['NetAssets'][-1]
+        np.testing.assert_allclose(getattr(real, long)['NetAssets'][-1], before_sale)
+
+
+@pytest.mark.parametrize('overrides', [
+    {},
+    # The renter's investments end in a loss, which is not taxed
+    {'rent': 2_000},
+    {'stock_return': -0.02},
+    {'savings': 100, 'rent_growth': 0.03, 'condo_growth': 0.02, 'apartment_tax': 0.2},
+])
+def test_scenarios_equal_the_page(overrides):
+    # Up to the instalment that the page rounds to whole dollars
+    params = Params(**overrides)
+    result = simulate(params)
+    expected = evaluate_scenarios(params.scenario_params(), full=False)
+    np.testing.assert_allclose(result.owning_long['NetAssets'][-1], expected.owner_final[0], rtol=5e-3)
+    np.testing.assert_allclose(result.renting_long['NetAssets'][-1], expected.renter_final[0], rtol=5e-3)
+
+
+@pytest.mark.parametrize('realize_years, misses', [
+    (0, {'owning_long', 'renting_long'}),
+    # The taxes of the realizations are withdrawn from the accounts
+    (3, {'ledger', 'renting', 'owning_schedule', 'owning_long', 'renting_schedule', 'renting_long'}),
+])
+def test_stock_tax_reruns_only_the_stages_it_changes(realize_years, misses):
+    PIPELINE.run(Params(realize_years=realize_years))
+    before = PIPELINE.stats()
+    outputs = PIPELINE.run(Params(stock_tax=0.2, realize_years=realize_years))
+    after = PIPELINE.stats()
+    assert {name for name in after if after[name]['misses'] > before[name]['misses']} == misses
+    # The same as computing every stage again
+    fresh = Pipeline(PIPELINE.stages).run(Params(stock_tax=0.2, realize_years=realize_years))
+    for name in ('owning_long', 'renting_long'):
+        np.testing.assert_array_equal(outputs[name]['NetAssets'], fresh[name]['NetAssets'])
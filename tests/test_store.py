@@ -0,0 +1,56 @@
+import itertools
+import pickle
+
+import numpy as np
+
+import store
+from simulation import Params
+
+
+def test_round_trip_and_key(tmp_path):
+    results = store.ResultStore(str(tmp_path / 'results.sqlite'))
+    value = {'NetAssets': np.arange(5.0)}
+    results.put(store.params_key(Params()), value)
+    np.testing.assert_array_equal(results.get(store.params_key(Params()))['NetAssets'], value['NetAssets'])
+    assert results.get(store.params_key(Params(rent=900))) is None
+    assert store.params_key(Params()) == store.params_key(Params()._asdict())
+
+
+def test_least_recently_used_are_evicted(tmp_path, monkeypatch):
+    clock = itertools.count()
+    monkeypatch.setattr(store.time, 'time', lambda: next(clock))
+    size = len(pickle.dumps(b'x' * 1_000, protocol=pickle.HIGHEST_PROTOCOL))
+    results = store.ResultStore(str(tmp_path / 'results.sqlite'), max_bytes=2 * size)
+    results.put('a', b'x' * 1_000)
+    results.put('b', b'x' * 1_000)
+    results.get('a')
+    results.put('c', b'x' * 1_000)
+    assert [results.get(key) is not None for key in 'abc'] == [True, False, True]
+    assert results.stats() == {'results': 2, 'bytes': 2 * size}
+
+
+def test_other_model_version_is_dropped(tmp_path, monkeypatch):
+    path = str(tmp_path / 'results.sqlite')
+    key = store.params_key(Params())
+    store.ResultStore(path).put(key, 1)
+    assert store.ResultStore(path).get(key) == 1
+    monkeypatch.setattr(store, 'MODEL_VERSION', store.MODEL_VERSION + 1)
+    assert store.params_key(Params()) != key
+    assert store.ResultStore(path).get(key) is None
+
+
+def test_unreadable_result_is_deleted(tmp_path):
+    results = store.ResultStore(str(tmp_path / 'results.sqlite'))
+    with results._connection() as db:
+        db.execute('INSERT INTO results VALUES (?, ?, ?, ?)', ('a', b'not a pickle', 12, 0.0))
+    assert results.get('a') is None
+    assert results.stats()['results'] == 0
+
+
+def test_persist_computes_once(tmp_path, monkeypatch):
+    results = store.ResultStore(str(tmp_path / 'results.sqlite'))
+    monkeypatch.setattr(store, 'default_store', lambda: results)
+    calls = []
+    compute = store.persist(lambda params: calls.append(params) or params.rent * 2)
+    assert compute(Params(rent=900)) == compute(Params(rent=900)) == 1_800
+    assert calls == [Params(rent=900)]
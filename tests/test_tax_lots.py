@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from tax_lots import lots, yearly_tax
+
+
+# 100 units bought at 1, 100 at 2, then the units worth 400 sold at 4
+PRICES = [1.0, 2.0, 4.0]
+FLOWS = [100.0, 200.0, -400.0]
+
+
+@pytest.mark.parametrize('method, gain, basis', [
+    # The first lot of cost 100 is sold
+    ('fifo', 300.0, 200.0),
+    # Half of the cost 300 is sold
+    ('average', 250.0, 150.0),
+])
+def test_two_lot_sale(method, gain, basis):
+    result = lots(PRICES, FLOWS, method=method)
+    np.testing.assert_allclose(result.gains, [0.0, 0.0, gain])
+    np.testing.assert_allclose(result.basis[-1], basis)
+    np.testing.assert_allclose(result.units[-1], 100.0)
+
+
+def test_initial_value_is_the_first_lot():
+    result = lots(PRICES, [0.0, 0.0, -200.0], initial_value=100.0)
+    np.testing.assert_allclose(result.gains[-1], 150.0)
+    np.testing.assert_allclose(result.basis[-1], 50.0)
+
+
+def months(*yearly):
+    '''Realized gains of every year, all in its last month'''
+    gains = np.zeros(12 * len(yearly))
+    gains[11::12] = yearly
+    return gains
+
+
+def test_loss_is_carried_into_a_later_gain_year():
+    tax, carried = yearly_tax(months(-100, 300), 0.3)
+    np.testing.assert_allclose(tax, [0.0, 60.0])
+    np.testing.assert_allclose(carried, 0.0)
+
+    tax, carried = yearly_tax(months(-100, 30, 20), 0.3, carried_loss=50)
+    np.testing.assert_allclose(tax, [0.0, 0.0, 0.0])
+    np.testing.assert_allclose(carried, 100.0)
+
+
+def test_allowance_of_every_year():
+    # Not carried over, the unused allowance of the first year is lost
+    tax, carried = yearly_tax(months(50, 300), 0.3, allowance=100)
+    np.testing.assert_allclose(tax, [0.0, 60.0])
+    np.testing.assert_allclose(carried, 0.0)